@@ -7,9 +7,15 @@ from .main import (
 from .sessions import (
     WebhookSignalSession,
     disable_webhooks,
+    get_current_session,
     webhook_signal_session,
 )
-from .tasks import dispatch_serializer_webhook_event, dispatch_webhook_event
+from .tasks import (
+    dispatch_serializer_webhook_event,
+    dispatch_serializer_webhook_events,
+    dispatch_serializer_webhook_events_bulk,
+    dispatch_webhook_event,
+)
 
 default_app_config = 'drf_webhooks.apps.AppConfig'
 
@@ -21,6 +27,9 @@ __all__ = [
     'WebhookSignalSession',
     'webhook_signal_session',
     'disable_webhooks',
+    'get_current_session',
     'dispatch_serializer_webhook_event',
+    'dispatch_serializer_webhook_events',
+    'dispatch_serializer_webhook_events_bulk',
     'dispatch_webhook_event',
 ]
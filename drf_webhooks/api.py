@@ -2,7 +2,8 @@ from rest_framework import serializers, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from .config import conf
+from .config import REGISTERED_WEBHOOK_CHOICES, conf
+from .events import get_matcher, is_pattern
 
 Webhook = conf.WEBHOOK_MODEL
 
@@ -19,8 +20,21 @@ class WebhookSerializer(serializers.ModelSerializer):
             'target_method',
             'target_content_type',
             'target_headers',
+            'max_batch_size',
+            'max_batch_wait',
         )
 
+    def validate_events(self, events: list[str]) -> list[str]:
+        # Patterns (`inventory.*`) must match at least one registered event, so typos are caught
+        for event in events:
+            if event in REGISTERED_WEBHOOK_CHOICES:
+                continue
+            if not is_pattern(event):
+                raise serializers.ValidationError(f"Unknown event {event!r}")
+            if not get_matcher([event]).match_many(REGISTERED_WEBHOOK_CHOICES):
+                raise serializers.ValidationError(f"{event!r} does not match any event")
+        return events
+
 
 class WebhookViewSet(viewsets.ModelViewSet):
     model = Webhook
@@ -3,3 +3,9 @@ from django.apps import AppConfig as AppConfig_
 
 class AppConfig(AppConfig_):
     name = 'drf_webhooks'
+
+    def ready(self):
+        from . import sessions, subscriptions
+
+        sessions.connect_signals()
+        subscriptions.connect_signals()
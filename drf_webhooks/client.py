@@ -0,0 +1,84 @@
+import os
+import threading
+from typing import TYPE_CHECKING
+
+import httpx
+
+from .config import conf
+
+if TYPE_CHECKING:
+    from drf_webhooks.models import AbstractWebhook
+
+_client: httpx.Client | None = None
+_client_pid: int | None = None
+_lock = threading.Lock()
+
+
+def _create_client() -> httpx.Client:
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=conf.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=conf.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=conf.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        http2=conf.HTTP2,
+    )
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Returns the connection pool of the current process.
+
+    The pool is created lazily and recreated after a fork (e.g. celery prefork workers),
+    so sockets are never shared between processes.
+    """
+    global _client, _client_pid
+
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _lock:
+            if _client is None or _client_pid != pid:
+                _client = _create_client()
+                _client_pid = pid
+    return _client
+
+
+def close_http_client():
+    global _client, _client_pid
+
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+def _reset_after_fork():
+    global _client, _client_pid, _lock
+
+    # The inherited sockets belong to the parent, drop them without closing
+    _client = None
+    _client_pid = None
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def create_async_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=conf.ASYNC_DELIVERY_CONCURRENCY,
+            max_keepalive_connections=conf.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=conf.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        http2=conf.HTTP2,
+    )
+
+
+def get_timeout(webhook: "AbstractWebhook | None") -> httpx.Timeout:
+    return httpx.Timeout(
+        (webhook and webhook.read_timeout) or conf.HTTP_READ_TIMEOUT,
+        connect=(webhook and webhook.connect_timeout) or conf.HTTP_CONNECT_TIMEOUT,
+    )
@@ -11,6 +11,57 @@ class WebhooksConfig:
     DEFAULT_JSON_RENDERER_CLASS: str = 'rest_framework.renderers.JSONRenderer'
     DEFAULT_XML_RENDERER_CLASS: str = 'rest_framework_xml.renderers.XMLRenderer'
     OWNER_FIELD: str = 'owner'
+    # Snapshot the watched fields of loaded instances, so saves without `update_fields` that don't change
+    # anything a serializer reads are dropped. Costs a `post_init` receiver for every instance of watched models
+    TRACK_FIELD_CHANGES: bool = False
+    # Maximum number of values bound in a single `__in` lookup
+    MAX_QUERY_PARAMS: int = 1000
+    # Nested changes of a session affecting more base instances than this are dispatched in the background,
+    # see `ModelSerializerWebhook.max_fan_out`. None: always resolved in the session
+    MAX_NESTED_FAN_OUT: int | None = 1000
+    # Cache subscription lookups. None: disabled, 'local': in-process LRU, otherwise: a Django cache alias
+    SUBSCRIPTION_CACHE: str | None = None
+    SUBSCRIPTION_CACHE_TTL: str = '5 minutes'
+    SUBSCRIPTION_CACHE_MAX_SIZE: int = 10000
+    # Resolve subscriptions from the `WebhookSubscription` table instead of the webhooks' `events` arrays
+    SUBSCRIPTION_TABLE: bool = False
+    # 'webhook': one serialization task per (instance, webhook)
+    # 'instance': one serialization task per instance, fanned out to a delivery task per webhook
+    # 'bulk': one serialization task per event and chunk of `BULK_DISPATCH_SIZE` instances
+    # 'session': one task per session and chunk of `SESSION_BATCH_SIZE` events, serializing and sending them all
+    DISPATCH_MODE: str = 'webhook'
+    BULK_DISPATCH_SIZE: int = 100
+    SESSION_BATCH_SIZE: int = 500
+    # Flush sessions early once they buffer this many instances, to bound their memory. None: unbounded
+    SESSION_MAX_SIGNALS: int | None = None
+    # Store events in the outbox table in the session's transaction instead of queueing tasks,
+    # the `relay_webhook_outbox` task queues them in batches
+    OUTBOX: bool = False
+    OUTBOX_BATCH_SIZE: int = 1000
+    # Django cache alias holding the debounce windows of `ModelSerializerWebhook.debounce`,
+    # must be shared by all processes (e.g. redis or memcached)
+    DEBOUNCE_CACHE: str = 'default'
+    # Django cache alias remembering the last delivered payload per (webhook, object), `updated` events
+    # with an unchanged payload are not delivered. None: disabled
+    PAYLOAD_FINGERPRINTS: str | None = None
+    PAYLOAD_FINGERPRINTS_TTL: str = '1 day'
+    # Connection pool of each worker process, timeouts are in seconds
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 5.0
+    HTTP2: bool = False  # Requires `httpx[http2]`
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_READ_TIMEOUT: float = 10.0
+    # 'celery': send requests in `dispatch_webhook_event` tasks
+    # 'asyncio': only render and store requests, the `deliver_webhooks` management command sends them
+    DELIVERY_BACKEND: str = 'celery'
+    ASYNC_DELIVERY_CONCURRENCY: int = 1000
+    ASYNC_DELIVERY_PER_HOST: int = 20
+    ASYNC_DELIVERY_POLL_INTERVAL: float = 1.0
+    # Requests claimed for longer than this without a response or an error are queued again
+    ASYNC_DELIVERY_CLAIM_TIMEOUT: str = '5 minutes'
+    # Seconds a batch waits to fill up, for webhooks with `max_batch_size` and no `max_batch_wait`
+    BATCH_MAX_WAIT: float = 10.0
 
     @property
     def WEBHOOK_MODEL(self):
@@ -28,6 +79,14 @@ class WebhooksConfig:
     def WEBHOOK_LOG_ENTRY_MODEL_NAME(self):
         return f"{self.MAIN_APP}.WebhookLogEntry"
 
+    @property
+    def WEBHOOK_OUTBOX_MODEL(self):
+        return apps.get_model(self.MAIN_APP, "WebhookOutboxEvent")
+
+    @property
+    def WEBHOOK_SUBSCRIPTION_MODEL(self):
+        return apps.get_model(self.MAIN_APP, "WebhookSubscription")
+
 
 conf = WebhooksConfig(**getattr(settings, 'WEBHOOKS', {}))
 
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import timedelta
+from typing import TYPE_CHECKING, Mapping
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.db import connections, transaction
+from django.utils import timezone
+from pytimeparse.timeparse import timeparse
+
+from .client import create_async_http_client, get_timeout
+from .config import conf
+from .tasks import _record_error, _record_response
+
+if TYPE_CHECKING:
+    from drf_webhooks.models import AbstractWebhookLogEntry
+
+logger = logging.getLogger(__name__)
+
+
+def claim_pending_log_entries(
+    limit: int,
+    per_host: int,
+    in_flight: Mapping[str, int] | None = None,
+) -> list["AbstractWebhookLogEntry"]:
+    """
+    Claim up to `limit` rendered but unsent requests, oldest first,
+    without exceeding `per_host` requests in flight to any host (including `in_flight`).
+
+    Rows locked by another engine are skipped, so several engines can run side by side.
+    Claimed entries are no longer pending and carry a `claimed_dt` until their response or error is recorded.
+    """
+    model = conf.WEBHOOK_LOG_ENTRY_MODEL
+    hosts = Counter(in_flight or {})
+
+    # Saturated hosts are left out, their backlog must not take the place of other hosts' requests
+    candidates = (
+        model.objects.filter(pending=True)
+        .exclude(req_host__in=[host for host, count in hosts.items() if count >= per_host])
+        .order_by('req_dt')
+        .values_list('pk', 'req_host')[:limit]
+    )
+    pks = []
+    for pk, host in candidates:
+        if hosts[host] < per_host:
+            hosts[host] += 1
+            pks.append(pk)
+
+    if not pks:
+        return []
+
+    now = timezone.now()
+    with transaction.atomic():
+        log_entries = list(
+            model.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('webhook')
+            .filter(pk__in=pks, pending=True)
+            .order_by('req_dt')
+        )
+        model.objects.filter(pk__in=[e.pk for e in log_entries]).update(pending=False, claimed_dt=now)
+
+    for log_entry in log_entries:
+        log_entry.pending = False
+        log_entry.claimed_dt = now
+    return log_entries
+
+
+def requeue_stale_log_entries(timeout: timedelta | None = None) -> int:
+    """
+    Queue requests again that were claimed but never got a response or an error recorded,
+    e.g. because the engine sending them was killed. Returns the number of requeued entries.
+
+    Such requests may have reached their target, receivers can tell by the event id.
+    """
+    if timeout is None:
+        timeout = timedelta(seconds=timeparse(conf.ASYNC_DELIVERY_CLAIM_TIMEOUT))
+
+    return conf.WEBHOOK_LOG_ENTRY_MODEL.objects.filter(claimed_dt__lt=timezone.now() - timeout).update(
+        pending=True,
+        claimed_dt=None,
+    )
+
+
+class AsyncDeliveryEngine:
+    """
+    Sends pending requests stored by `dispatch_webhook_event` (with `DELIVERY_BACKEND = 'asyncio'`)
+    with up to `concurrency` requests in flight, and at most `per_host` of them to the same host.
+    """
+
+    def __init__(
+        self,
+        concurrency: int | None = None,
+        per_host: int | None = None,
+        poll_interval: float | None = None,
+        claim_timeout: timedelta | None = None,
+    ):
+        self.concurrency = concurrency or conf.ASYNC_DELIVERY_CONCURRENCY
+        self.per_host = per_host or conf.ASYNC_DELIVERY_PER_HOST
+        self.poll_interval = poll_interval or conf.ASYNC_DELIVERY_POLL_INTERVAL
+        self.claim_timeout = claim_timeout or timedelta(seconds=timeparse(conf.ASYNC_DELIVERY_CLAIM_TIMEOUT))
+
+        self._stopping = asyncio.Event()
+        self._in_flight: set[asyncio.Task] = set()
+        # host -> number of requests in flight
+        self._hosts: Counter[str] = Counter()
+
+    def stop(self):
+        self._stopping.set()
+
+    async def run(self, once: bool = False):
+        """
+        Deliver until `stop()` is called. With `once`, return as soon as nothing is pending or in flight.
+        """
+        loop = asyncio.get_running_loop()
+        requeue_at = loop.time()
+
+        async with create_async_http_client() as client:
+            while not self._stopping.is_set():
+                if loop.time() >= requeue_at:
+                    if requeued := await sync_to_async(requeue_stale_log_entries)(self.claim_timeout):
+                        logger.warning(f"Requeued {requeued} webhook requests claimed for over {self.claim_timeout}")
+                    requeue_at = loop.time() + self.claim_timeout.total_seconds()
+
+                free = self.concurrency - len(self._in_flight)
+                log_entries = []
+                if free > 0:
+                    log_entries = await sync_to_async(claim_pending_log_entries)(free, self.per_host, dict(self._hosts))
+
+                for log_entry in log_entries:
+                    self._start(client, log_entry)
+
+                if not log_entries:
+                    if once and not self._in_flight:
+                        break
+                    await self._wait()
+
+            if self._in_flight:
+                await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+        # Database work ran in the thread of `sync_to_async`
+        await sync_to_async(connections.close_all)()
+
+    def _start(self, client: httpx.AsyncClient, log_entry: "AbstractWebhookLogEntry"):
+        host = log_entry.req_host
+        self._hosts[host] += 1
+
+        def done(task: asyncio.Task):
+            self._in_flight.discard(task)
+            self._hosts[host] -= 1
+            if not self._hosts[host]:
+                del self._hosts[host]
+
+        task = asyncio.create_task(self._deliver(client, log_entry))
+        self._in_flight.add(task)
+        task.add_done_callback(done)
+
+    async def _wait(self):
+        # Until stopped, a slot is freed or it's time to poll again
+        stopping = asyncio.create_task(self._stopping.wait())
+        try:
+            await asyncio.wait(
+                [stopping, *self._in_flight],
+                timeout=self.poll_interval,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            stopping.cancel()
+
+    async def _deliver(self, client: httpx.AsyncClient, log_entry: "AbstractWebhookLogEntry"):
+        try:
+            res = await client.request(
+                log_entry.req_method.upper(),
+                url=log_entry.req_url,
+                headers=log_entry.req_headers,
+                content=log_entry.req_content,
+                timeout=get_timeout(log_entry.webhook),
+            )
+        except (httpx.HTTPError, httpx.InvalidURL) as e:
+            await sync_to_async(_record_error)(log_entry, e)
+            return
+        except Exception:
+            # The claim is kept, the request is queued again after `ASYNC_DELIVERY_CLAIM_TIMEOUT`
+            logger.exception(f"Webhook delivery {log_entry.pk} failed")
+            return
+
+        await sync_to_async(_record_response)(log_entry, res)
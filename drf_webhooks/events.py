@@ -0,0 +1,64 @@
+from functools import lru_cache
+from typing import Iterable
+
+WILDCARD = '*'
+SEPARATOR = '.'
+
+
+def is_pattern(event: str) -> bool:
+    return WILDCARD in event.split(SEPARATOR)
+
+
+@lru_cache(maxsize=4096)
+def get_candidate_patterns(event: str) -> frozenset[str]:
+    """
+    Every event or pattern that subscribes to `event`, so webhooks can be looked up by equality / overlap
+    on the stored events instead of matching each webhook's patterns.
+
+    `*` matches exactly one segment, a trailing `*` matches all remaining segments as well:
+    `inventory.*` matches `inventory.item.created`, `*.deleted` matches `inventory.deleted` only.
+    """
+    segments = event.split(SEPARATOR)
+    candidates: set[str] = set()
+
+    def expand(prefix: tuple[str, ...], rest: list[str]):
+        if not rest:
+            candidates.add(SEPARATOR.join(prefix))
+            return
+        # A trailing wildcard here swallows the rest of the event
+        candidates.add(SEPARATOR.join((*prefix, WILDCARD)))
+        expand((*prefix, rest[0]), rest[1:])
+        if len(rest) > 1:
+            expand((*prefix, WILDCARD), rest[1:])
+
+    expand((), segments)
+    return frozenset(candidates)
+
+
+class EventMatcher:
+    """
+    Compiled events of a webhook, matching an event is a set intersection with its cached candidate patterns
+    """
+
+    __slots__ = ('events',)
+
+    def __init__(self, events: Iterable[str]):
+        self.events = frozenset(events)
+
+    def matches(self, event: str) -> bool:
+        return not self.events.isdisjoint(get_candidate_patterns(event))
+
+    def match_many(self, events: Iterable[str]) -> set[str]:
+        return {event for event in events if self.matches(event)}
+
+
+@lru_cache(maxsize=4096)
+def _compile(events: frozenset[str]) -> EventMatcher:
+    return EventMatcher(events)
+
+
+def get_matcher(events: Iterable[str]) -> EventMatcher:
+    """
+    Matcher for the events of a webhook, cached by its set of events
+    """
+    return _compile(frozenset(events))
@@ -0,0 +1,70 @@
+import hashlib
+import json
+from typing import TYPE_CHECKING, Hashable
+
+from django.core.cache import caches
+from pytimeparse.timeparse import timeparse
+
+from .config import conf
+
+if TYPE_CHECKING:
+    from drf_webhooks.models import AbstractWebhookLogEntry
+
+suppressed_key = 'drf_webhooks:fingerprints:suppressed'
+
+
+def get_fingerprint(payload: dict) -> str:
+    """
+    Stable hash of a payload, independent of key order
+    """
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _make_key(webhook_id: Hashable, object_id: str | None) -> str:
+    return f'drf_webhooks:fingerprints:{webhook_id}:{object_id}'
+
+
+def is_unchanged(webhook_id: Hashable, object_id: str | None, payload: dict) -> bool:
+    """
+    Whether `payload` is what was last delivered to the webhook for the object.
+    Always `False` when `conf.PAYLOAD_FINGERPRINTS` is disabled.
+    """
+    if not conf.PAYLOAD_FINGERPRINTS:
+        return False
+    return caches[conf.PAYLOAD_FINGERPRINTS].get(_make_key(webhook_id, object_id)) == get_fingerprint(payload)
+
+
+def record_delivered(log_entry: "AbstractWebhookLogEntry"):
+    """
+    Remember the payloads of a delivered request, a single event or a batch of them
+    """
+    if not conf.PAYLOAD_FINGERPRINTS or not log_entry.req_data:
+        return
+
+    envelopes = log_entry.req_data if isinstance(log_entry.req_data, list) else [log_entry.req_data]
+    caches[conf.PAYLOAD_FINGERPRINTS].set_many(
+        {
+            _make_key(log_entry.webhook_id, envelope.get('object_id')): get_fingerprint(envelope.get('payload') or {})
+            for envelope in envelopes
+        },
+        timeout=timeparse(conf.PAYLOAD_FINGERPRINTS_TTL),
+    )
+
+
+def count_suppressed():
+    cache = caches[conf.PAYLOAD_FINGERPRINTS]
+    try:
+        cache.incr(suppressed_key)
+    except ValueError:
+        # Missing key
+        cache.add(suppressed_key, 0, timeout=None)
+        cache.incr(suppressed_key)
+
+
+def get_suppressed_count() -> int:
+    """
+    Number of `updated` events that were not delivered because their payload was unchanged
+    """
+    if not conf.PAYLOAD_FINGERPRINTS:
+        return 0
+    return caches[conf.PAYLOAD_FINGERPRINTS].get(suppressed_key, 0)
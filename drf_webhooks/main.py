@@ -1,26 +1,47 @@
 import logging
-from collections import defaultdict, deque
-from functools import reduce
+from contextlib import suppress
+from dataclasses import dataclass
+from functools import partial, reduce
 from operator import __or__
+from types import MappingProxyType
 from typing import (
     Callable,
-    DefaultDict,
     Hashable,
+    Iterable,
     Literal,
+    Mapping,
     NamedTuple,
     Type,
     TypedDict,
 )
 
-from django.db import models
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models, router, transaction
+from django.db.models.constants import LOOKUP_SEP
 from inflection import underscore
+from pytimeparse.timeparse import timeparse
 from rest_framework import serializers
 from rest_framework.renderers import BaseRenderer
 
-from drf_webhooks.utils import get_serializer_query_names
+from drf_webhooks.utils import (
+    chunked,
+    get_serializer_query_names,
+    get_serializer_related_paths,
+    get_serializer_watched_fields,
+)
 
 from .config import REGISTERED_WEBHOOK_CHOICES, conf
-from .tasks import dispatch_serializer_webhook_event
+from .outbox import write_outbox
+from .signals import nested_fan_out
+from .subscriptions import get_subscribed_webhook_ids
+from .tasks import (
+    dispatch_nested_changes,
+    dispatch_serializer_webhook_event,
+    dispatch_serializer_webhook_events,
+    dispatch_serializer_webhook_events_bulk,
+    dispatch_session_batch,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -31,12 +52,31 @@ class Signal(NamedTuple):
     instance: models.Model
     pk: Hashable
     cud: WebhookCUD
+    # `update_fields` of the save, `None` if any field may have changed
+    update_fields: frozenset[str] | None = None
+
+
+class WebhookEvent(NamedTuple):
+    event: str
+    owner_id: Hashable
+    object_id: str
+    webhook_ids: tuple[str, ...]
+    # `None` for deleted instances, which are sent without payload
+    serializer_class_module: str | None
+
+
+class Route(NamedTuple):
+    webhook: "ModelSerializerWebhook"
+    # The model registered on the webhook that the signal's model resolved to
+    model: Type[models.Model]
 
 
 class Store(TypedDict):
     disable_webhooks: bool
     model_serializer_webhook_instances: dict[Type[serializers.ModelSerializer], "ModelSerializerWebhook"]
     model_serializer_webhook_base_names: set[str]
+    model_routes: dict[Type[models.Model], tuple[Route, ...]]
+    cascade_routes: dict[Type[models.Model], bool]
 
 
 SignalModelInstanceBaseMap = dict[
@@ -44,10 +84,32 @@ SignalModelInstanceBaseMap = dict[
     Callable[[models.Model], models.Q],
 ]
 
+
+@dataclass(frozen=True)
+class WebhookPlan:
+    """
+    Everything a `ModelSerializerWebhook` derives from its serializer tree.
+    Compiled once per registration instead of on every session.
+    """
+
+    # Query paths from the base model to nested models whose getter was generated from the serializer tree.
+    # These are resolved with grouped `__in` lookups, other getters are called per instance.
+    query_names: Mapping[Type[models.Model], tuple[str, ...]]
+    base_getters: Mapping[Type[models.Model], Callable[[models.Model], models.Q]]
+    watched_models: tuple[Type[models.Model], ...]
+    # Fields read by the serializer tree per model, `None` (or missing) if any change matters
+    watched_fields: Mapping[Type[models.Model], frozenset[str] | None]
+    # Related lookups used when loading instances for serialization
+    select_related: tuple[str, ...]
+    prefetch_related: tuple[str, ...]
+
+
 _STORE: Store = {
     "disable_webhooks": False,
     "model_serializer_webhook_instances": {},
     "model_serializer_webhook_base_names": set(),
+    "model_routes": {},
+    "cascade_routes": {},
 }
 
 
@@ -63,6 +125,21 @@ class ModelSerializerWebhook:
 
     signal_model_instance_base_getters: SignalModelInstanceBaseMap = {}
 
+    # Lookup from the model to its owner, `__` separated (default: `OWNER_FIELD` setting)
+    owner_field: str | None = None
+
+    # Override the related lookups derived from the serializer tree
+    select_related: tuple[str, ...] | None = None
+    prefetch_related: tuple[str, ...] | None = None
+
+    # Coalesce `updated` events of the same instance and webhook across sessions, e.g. "5s".
+    # The first one is delivered after the window with the state at that time, the others are dropped.
+    debounce: str | None = None
+
+    # Nested changes affecting more base instances than this are dispatched by a background task
+    # (default: `MAX_NESTED_FAN_OUT` setting)
+    max_fan_out: int | None = None
+
     def __init__(self, serializer_class: Type[serializers.ModelSerializer]):
         self.serializer_class = serializer_class
         model: Type[models.Model] = self.serializer_class.Meta.model
@@ -74,7 +151,8 @@ class ModelSerializerWebhook:
         self.nested_serializers = tuple(self._find_nested_model_serializers(self.serializer_class(), []))
         self.nested_serializers_map = {m: s for m, s, _ in self.nested_serializers}
 
-        _getters = self.get_signal_model_instance_base_getters()
+        self._plan: WebhookPlan | None = self._compile()
+        _getters = self._plan.base_getters
 
         _getters_not_implemented = [m for m in self.nested_serializers_map.keys() if m not in _getters]
         if _getters_not_implemented:
@@ -117,48 +195,308 @@ class ModelSerializerWebhook:
     def serializer_module_path(self):
         return f"{self.serializer_class.__module__}.{self.serializer_class.__name__}"
 
-    def get_owner(self, instance: models.Model) -> models.Model:
-        return getattr(instance, conf.OWNER_FIELD)
+    @property
+    def owner_lookup(self) -> str:
+        return self.owner_field or conf.OWNER_FIELD
+
+    def get_owner(self, instance: models.Model) -> models.Model | None:
+        owner = instance
+        for name in self.owner_lookup.split(LOOKUP_SEP):
+            owner = getattr(owner, name)
+            if owner is None:
+                return None
+        return owner
+
+    def _is_field_lookup(self, lookup: str) -> bool:
+        # Properties and reverse relations can't be resolved with `values_list`
+        model = self.model
+        for name in lookup.split(LOOKUP_SEP):
+            if model is None:
+                return False
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return False
+            if not field.concrete:
+                return False
+            model = field.related_model
+        return True
+
+    def get_owners(self, instances: Iterable[models.Model]) -> dict[Hashable, Hashable]:
+        """
+        Primary keys of the owners of `instances` by instance primary key, instances without an owner are left out.
+
+        Owners are never loaded: a local foreign key is read from the instances and a `__` separated lookup is
+        resolved with one `values_list` query per `conf.MAX_QUERY_PARAMS` instances.
+        When `get_owner` is overridden, or the lookup isn't a path of fields (e.g. a property), it is called
+        per instance instead.
+        """
+        instances = list(instances)
+        lookup = self.owner_lookup
+        if type(self).get_owner is not ModelSerializerWebhook.get_owner or not self._is_field_lookup(lookup):
+            owners = ((instance.pk, self.get_owner(instance)) for instance in instances)
+            return {pk: owner.pk for pk, owner in owners if owner}
+
+        if LOOKUP_SEP not in lookup:
+            attname = self.model._meta.get_field(lookup).attname
+            owner_pks = ((instance.pk, getattr(instance, attname)) for instance in instances)
+            return {pk: owner_pk for pk, owner_pk in owner_pks if owner_pk is not None}
+
+        owner_pks = {}
+        for chunk in chunked([instance.pk for instance in instances], conf.MAX_QUERY_PARAMS):
+            queryset = self.model._default_manager.filter(pk__in=chunk, **{f'{lookup}__isnull': False})
+            owner_pks.update(queryset.values_list('pk', lookup))
+        return owner_pks
+
+    @property
+    def plan(self) -> WebhookPlan:
+        if self._plan is None:
+            self._plan = self._compile()
+        return self._plan
+
+    @property
+    def watched_models(self) -> tuple[Type[models.Model], ...]:
+        return self.plan.watched_models
+
+    def _compile(self) -> WebhookPlan:
+        getters = self.get_signal_model_instance_base_getters()
+        query_names = {m: getter.query_names for m, getter in getters.items() if hasattr(getter, 'query_names')}
+
+        related_paths = list(get_serializer_related_paths(self.serializer_class()))
+        select_related = self.select_related
+        if select_related is None:
+            select_related = tuple(lookup for lookup, many in related_paths if not many)
+        prefetch_related = self.prefetch_related
+        if prefetch_related is None:
+            prefetch_related = tuple(lookup for lookup, many in related_paths if many)
+
+        watched_fields = get_serializer_watched_fields(self.serializer_class())
+        base_fields = watched_fields.get(self.model)
+        if base_fields is not None:
+            # Changing the owner changes who receives the events
+            with suppress(FieldDoesNotExist):
+                owner_field = self.model._meta.get_field(self.owner_lookup.split(LOOKUP_SEP)[0])
+                base_fields.update({owner_field.name, owner_field.attname})  # type: ignore
+
+        return WebhookPlan(
+            query_names=MappingProxyType(query_names),
+            base_getters=MappingProxyType(getters),
+            watched_models=(self.model, *getters.keys()),
+            watched_fields=MappingProxyType(
+                {
+                    # Custom getters may depend on anything
+                    m: frozenset(fields) if fields is not None and (m is self.model or m in query_names) else None
+                    for m, fields in watched_fields.items()
+                }
+            ),
+            select_related=tuple(select_related),
+            prefetch_related=tuple(prefetch_related),
+        )
+
+    def _invalidate(self):
+        self._plan = None
 
     def get_signal_model_instance_base_getters(self) -> SignalModelInstanceBaseMap:
+        """
+        Called once when the webhook is compiled, the result is kept in `plan.base_getters`
+        """
         getters = self._generate_signal_model_instance_base_getters()
         getters.update(self.signal_model_instance_base_getters)
         return getters
 
-    def _get_owner(self, instance: models.Model) -> models.Model:
-        owner = getattr(instance, "_cached_owner", None)
-        if owner:
-            return owner
-        return self.get_owner(instance)
+    def watches(self, model: Type[models.Model], update_fields: Iterable[str]) -> bool:
+        """
+        Whether saving `update_fields` of a `model` instance can change the payload
+        """
+        fields = self.plan.watched_fields.get(model)
+        return fields is None or not fields.isdisjoint(update_fields)
+
+    def get_queryset(self) -> models.QuerySet:
+        """
+        Queryset used to load instances for serialization
+        """
+        return self.model.objects.select_related(*self.plan.select_related).prefetch_related(
+            *self.plan.prefetch_related
+        )
 
     def _dispatch(self, instance: models.Model, cud: WebhookCUD):
-        event = f'{self.base_name}.{cud}'
-        owner = self._get_owner(instance)
-        if not owner:
-            return
+        return self._dispatch_many([(instance, cud)])
+
+    def _dispatch_many(self, changes: Iterable[tuple[models.Model, WebhookCUD]]):
+        return self._queue(self._get_events(changes))
+
+    def _get_events(self, changes: Iterable[tuple[models.Model, WebhookCUD]]) -> list[WebhookEvent]:
+        """
+        Resolve owners and subscriptions of changed base instances
+        """
+        changes = list(changes)
+
+        # Owners of deleted instances are captured by the session before the rows are gone
+        captured = {instance.pk: getattr(instance, '_webhook_owners', {}).get(self, None) for instance, _cud in changes}
+        owner_pks = self.get_owners(instance for instance, _cud in changes if captured[instance.pk] is None)
+        owner_pks.update((pk, owner_pk) for pk, owner_pk in captured.items() if owner_pk is not None)
+
+        pending: list[tuple[models.Model, str, WebhookCUD, Hashable]] = []
+        for instance, cud in changes:
+            owner_pk = owner_pks.get(instance.pk)
+            if owner_pk is None:
+                continue
+            pending.append((instance, f'{self.base_name}.{cud}', cud, owner_pk))
+
+        if not pending:
+            return []
+
+        subscriptions = get_subscribed_webhook_ids((owner_pk, event) for _, event, _, owner_pk in pending)
+
+        events: list[WebhookEvent] = []
+        for instance, event, cud, owner_pk in pending:
+            webhook_ids = subscriptions.get((owner_pk, event), ())
+            if not webhook_ids:
+                continue
+
+            events.append(
+                WebhookEvent(
+                    event=event,
+                    owner_id=owner_pk,
+                    object_id=str(instance.pk),
+                    webhook_ids=tuple(webhook_ids),
+                    serializer_class_module=self.serializer_module_path if cud != "deleted" else None,
+                )
+            )
+
+        return events
+
+    def _queue(self, events: list[WebhookEvent]):
+        if conf.OUTBOX:
+            return write_outbox(events)
+        return self._enqueue(events)
+
+    def _enqueue(self, events: list[WebhookEvent]):
+        events, debounced = self._debounce(events)
+        return [*self._enqueue_now(events), *self._enqueue_debounced(debounced)]
+
+    def _enqueue_now(self, events: list[WebhookEvent], countdown: int | None = None):
+        if not events:
+            return []
+        if conf.DISPATCH_MODE == 'bulk':
+            return self._queue_bulk(events, countdown)
+        if conf.DISPATCH_MODE == 'instance':
+            return self._queue_per_instance(events, countdown)
+        if conf.DISPATCH_MODE == 'session':
+            return queue_session_batch(self._get_session_batch_items(events), countdown)
+        return self._queue_per_webhook(events, countdown)
+
+    def _enqueue_debounced(self, events: list[WebhookEvent]):
+        # Serialized when the window closes, so the latest state is sent
+        return self._enqueue_now(events, countdown=self.debounce_seconds)
+
+    @property
+    def debounce_seconds(self) -> int | None:
+        return timeparse(self.debounce) if self.debounce else None
+
+    def _debounce(self, events: list[WebhookEvent]) -> tuple[list[WebhookEvent], list[WebhookEvent]]:
+        """
+        Split `events` into events to queue now and `updated` events opening a debounce window.
+        `updated` events for (webhook, instance) pairs that already have an open window are dropped.
+        """
+        timeout = self.debounce_seconds
+        if not timeout:
+            return events, []
+
+        cache = caches[conf.DEBOUNCE_CACHE]
+        now: list[WebhookEvent] = []
+        debounced: list[WebhookEvent] = []
+        for e in events:
+            if not e.event.endswith('.updated'):
+                now.append(e)
+                continue
+
+            # `add` is atomic, only the first event of a window gets through
+            webhook_ids = tuple(
+                webhook_id
+                for webhook_id in e.webhook_ids
+                if cache.add(f'drf_webhooks:debounce:{webhook_id}:{e.event}:{e.object_id}', True, timeout)
+            )
+            if webhook_ids:
+                debounced.append(e._replace(webhook_ids=webhook_ids))
 
-        webhook_ids = conf.WEBHOOK_MODEL.objects.filter(
-            **{conf.OWNER_FIELD: owner.pk},
-            events__contains=[event],
-        ).values_list('id', flat=True)
+        return now, debounced
 
+    def _queue_per_webhook(self, events: list[WebhookEvent], countdown: int | None = None):
         tasks = []
-        for webhook_id in webhook_ids:
-            task = dispatch_serializer_webhook_event.apply_async(
+        for e in events:
+            for webhook_id in e.webhook_ids:
+                task = dispatch_serializer_webhook_event.apply_async(
+                    args=(
+                        webhook_id,
+                        e.event,
+                        e.owner_id,
+                        e.object_id,
+                        e.serializer_class_module,
+                        self.json_renderer_class,
+                        self.xml_renderer_class,
+                    ),
+                    countdown=countdown,
+                )
+                tasks.append(task)
+        return tasks
+
+    def _queue_per_instance(self, events: list[WebhookEvent], countdown: int | None = None):
+        # Serialize once, deliver to every webhook
+        tasks = []
+        for e in events:
+            task = dispatch_serializer_webhook_events.apply_async(
                 args=(
-                    str(webhook_id),
-                    event,
-                    owner.pk,
-                    str(instance.pk),
-                    self.serializer_module_path if cud != "deleted" else None,
+                    list(e.webhook_ids),
+                    e.event,
+                    e.owner_id,
+                    e.object_id,
+                    e.serializer_class_module,
                     self.json_renderer_class,
                     self.xml_renderer_class,
                 ),
+                countdown=countdown,
             )
             tasks.append(task)
+        return tasks
+
+    def _queue_bulk(self, events: list[WebhookEvent], countdown: int | None = None):
+        # Serialize up to `conf.BULK_DISPATCH_SIZE` instances of the same event in one queryset pass
+        by_event: dict[tuple[str, str | None], list[WebhookEvent]] = {}
+        for e in events:
+            by_event.setdefault((e.event, e.serializer_class_module), []).append(e)
 
+        tasks = []
+        for (event, serializer_class_module), event_group in by_event.items():
+            for chunk in chunked(event_group, conf.BULK_DISPATCH_SIZE):
+                task = dispatch_serializer_webhook_events_bulk.apply_async(
+                    args=(
+                        event,
+                        [(e.object_id, e.owner_id, list(e.webhook_ids)) for e in chunk],
+                        serializer_class_module,
+                        self.json_renderer_class,
+                        self.xml_renderer_class,
+                    ),
+                    countdown=countdown,
+                )
+                tasks.append(task)
         return tasks
 
+    def _get_session_batch_items(self, events: list[WebhookEvent]) -> list[tuple]:
+        # Items of `dispatch_session_batch`, which may mix events of several webhooks
+        return [
+            (
+                e.event,
+                e.owner_id,
+                e.object_id,
+                list(e.webhook_ids),
+                e.serializer_class_module,
+                self.json_renderer_class,
+                self.xml_renderer_class,
+            )
+            for e in events
+        ]
+
     def on_create(self, instance: models.Model):
         return self._dispatch(instance, 'created')
 
@@ -178,69 +516,180 @@ class ModelSerializerWebhook:
                 yield from cls._find_nested_model_serializers(field, [*path, key])
 
     @staticmethod
-    def _base_getter_factory(q: set[str]):
+    def _base_getter_factory(q: tuple[str, ...]):
         def _fn(instance: models.Model):
             return reduce(
                 __or__,
                 [models.Q(**{query_str: instance}) for query_str in q],
             )
 
+        _fn.query_names = q  # type: ignore
         return _fn
 
-    def _generate_signal_model_instance_base_getters(self) -> SignalModelInstanceBaseMap:
-        queries: DefaultDict[Type[models.Model], set[str]] = defaultdict(set)
+    def _generate_serializer_query_names(self) -> dict[Type[models.Model], tuple[str, ...]]:
+        queries: dict[Type[models.Model], dict[str, None]] = {}
 
         for m, qname in get_serializer_query_names(self.serializer_class()):
-            queries[m].add(qname)
+            queries.setdefault(m, {})[qname] = None
 
-        return {m: self._base_getter_factory(q) for m, q in queries.items()}
+        return {m: tuple(q) for m, q in queries.items()}
 
-    def _exec(self, signals: deque[Signal]):
+    def _generate_signal_model_instance_base_getters(self) -> SignalModelInstanceBaseMap:
+        return {m: self._base_getter_factory(q) for m, q in self._generate_serializer_query_names().items()}
+
+    def _find_affected_pks(
+        self,
+        nested_pks: Mapping[Type[models.Model], set[Hashable]],
+        queries: list[models.Q],
+    ) -> set[Hashable]:
+        """
+        Resolve changed nested instances to the primary keys of the base instances they belong to.
+
+        One `path__in=[pks]` lookup is made per (model, query path), chunked to `conf.MAX_QUERY_PARAMS`.
+        Only primary keys are fetched, so parents referenced many times are deduplicated before being loaded.
+        """
+        affected_pks: set[Hashable] = set(self._iter_nested_affected_pks(nested_pks))
+
+        # Custom getters return arbitrary Q objects, which can only be OR'ed together
+        for chunk in chunked(queries, conf.MAX_QUERY_PARAMS):
+            queryset = self.model.objects.filter(reduce(__or__, chunk))
+            affected_pks.update(queryset.values_list('pk', flat=True))
+
+        return affected_pks
+
+    def _iter_nested_affected_pks(self, nested_pks: Mapping[Type[models.Model], Iterable[Hashable]]):
+        """
+        Stream the primary keys of base instances referencing the nested instances, with repeats
+        """
+        for model, pks in nested_pks.items():
+            for query_name in self.plan.query_names[model]:
+                for chunk in chunked(pks, conf.MAX_QUERY_PARAMS):
+                    queryset = self.model.objects.filter(**{f'{query_name}__in': chunk})
+                    yield from queryset.values_list('pk', flat=True).iterator(chunk_size=conf.MAX_QUERY_PARAMS)
+
+    def _dispatch_nested_changes(
+        self,
+        nested_pks: Mapping[Type[models.Model], Iterable[Hashable]],
+        exclude_pks: Iterable[Hashable] = (),
+    ) -> int:
+        """
+        Dispatch `updated` events for every base instance referencing the nested instances,
+        `conf.BULK_DISPATCH_SIZE` at a time. Returns the number of dispatched instances.
+        """
+        seen = set(exclude_pks)
+        size = 0
+
+        def affected_pks():
+            for pk in self._iter_nested_affected_pks(nested_pks):
+                if pk not in seen:
+                    seen.add(pk)
+                    yield pk
+
+        for chunk in chunked(affected_pks(), conf.BULK_DISPATCH_SIZE):
+            self._dispatch_many((instance, 'updated') for instance in self.model.objects.filter(pk__in=chunk))
+            size += len(chunk)
+
+        nested_fan_out.send(sender=self.__class__, webhook=self, size=size, background=True)
+        return size
+
+    def _exec(self, signals: Mapping[Type[models.Model], Iterable[Signal]]):
+        """
+        `signals` only contains the signals routed to this webhook, grouped by the watched model
+        """
+        # Subscriptions for every change in the session are resolved together
+        return self._dispatch_many(self._resolve_changes(signals))
+
+    def _resolve_changes(
+        self,
+        signals: Mapping[Type[models.Model], Iterable[Signal]],
+    ) -> list[tuple[models.Model, WebhookCUD]]:
+        """
+        Resolve the signals of a session to the base instances that changed, once each
+        """
         created = set()
         deleted = set()
         latest_instances: dict[Hashable, models.Model] = {}
+        # Changed base instances that were recorded by primary key only
+        unloaded_pks: set[Hashable] = set()
 
-        base_getters = self.get_signal_model_instance_base_getters()
+        base_getters = self.plan.base_getters
 
+        # Primary keys of changed nested instances, grouped by model
+        nested_pks: dict[Type[models.Model], set[Hashable]] = {}
         queries: list[models.Q] = []
 
-        for signal in signals:
-            if signal.instance.__class__ is self.model:
-                if signal.cud == "created":
-                    created.add(signal.pk)
-                elif signal.cud == "deleted":
-                    signal.instance.pk = signal.pk
-                    deleted.add(signal.pk)
+        for signal in signals.get(self.model, ()):
+            if signal.cud == "created":
+                created.add(signal.pk)
+            elif signal.cud == "deleted":
+                signal.instance.pk = signal.pk
+                deleted.add(signal.pk)
 
+            if signal.instance is None:
+                unloaded_pks.add(signal.pk)
+            else:
                 latest_instances[signal.pk] = signal.instance
-                continue
 
-            if signal.cud == "deleted":
+        for model, model_signals in signals.items():
+            if model is self.model:
                 continue
 
-            try:
-                getter = base_getters[signal.instance.__class__]
-            except KeyError:
-                pass
+            if model in self.plan.query_names:
+                nested_pks.setdefault(model, set()).update(
+                    signal.pk for signal in model_signals if signal.cud != "deleted"
+                )
+            elif model in base_getters:
+                getter = base_getters[model]
+                queries.extend(getter(signal.instance) for signal in model_signals if signal.cud != "deleted")
+
+        # Custom getters are resolved right away, generated query paths up to `max_fan_out` instances
+        affected_pks = self._find_affected_pks({}, queries)
+        if self.update and nested_pks:
+            limit = self.max_fan_out if self.max_fan_out is not None else conf.MAX_NESTED_FAN_OUT
+            nested_affected_pks: set[Hashable] = set()
+            for pk in self._iter_nested_affected_pks(nested_pks):
+                nested_affected_pks.add(pk)
+                if limit is not None and len(nested_affected_pks) > limit:
+                    # Resolved inside the transaction by outbox and early flushes, the task must not see stale rows
+                    task = partial(
+                        dispatch_nested_changes.apply_async,
+                        args=(
+                            self.serializer_module_path,
+                            {model._meta.label: list(pks) for model, pks in nested_pks.items()},
+                            [*latest_instances.keys(), *unloaded_pks, *affected_pks],
+                        ),
+                    )
+                    transaction.on_commit(task, using=router.db_for_write(self.model))
+                    nested_affected_pks = set()
+                    break
             else:
-                queries.append(getter(signal.instance))
+                nested_fan_out.send(
+                    sender=self.__class__,
+                    webhook=self,
+                    size=len(nested_affected_pks),
+                    background=False,
+                )
+            affected_pks |= nested_affected_pks
 
-        if queries:
-            queryset = self.model.objects.filter(reduce(__or__, queries))
-            for inst in queryset:
+        affected_pks = (affected_pks | unloaded_pks) - latest_instances.keys()
+        for pks in chunked(affected_pks, conf.MAX_QUERY_PARAMS):
+            for inst in self.model.objects.filter(pk__in=pks):
                 latest_instances[inst.pk] = inst
 
+        changes: list[tuple[models.Model, WebhookCUD]] = []
         for instance in latest_instances.values():
             if instance.pk in created and instance.pk in deleted:
                 # Both created and deleted in the same session.
                 # No webhooks sent
                 pass
             elif self.delete and instance.pk in deleted:
-                self.on_delete(instance)
+                changes.append((instance, 'deleted'))
             elif self.create and instance.pk in created:
-                self.on_create(instance)
+                changes.append((instance, 'created'))
             elif self.update:
-                self.on_update(instance)
+                changes.append((instance, 'updated'))
+
+        return changes
 
 
 def register_webhook(serializer_class: Type[serializers.ModelSerializer]):
@@ -262,6 +711,7 @@ def register_webhook(serializer_class: Type[serializers.ModelSerializer]):
         msw._register_all_choices()
         instances[msw.serializer_class] = msw
         base_names.add(msw.base_name)
+        _reset_routes()
 
         return msw
 
@@ -276,5 +726,106 @@ def unregister_webhook(serializer_class: Type[serializers.ModelSerializer]):
 
     del _STORE["model_serializer_webhook_instances"][serializer_class]
     _STORE["model_serializer_webhook_base_names"].remove(msw.base_name)
+    msw._invalidate()
+    _reset_routes()
 
     return True
+
+
+def get_serializer_queryset(serializer_class: Type[serializers.ModelSerializer]) -> models.QuerySet:
+    """
+    Queryset for loading instances serialized with `serializer_class`.
+    Uses the related lookups of the registered webhook, if any.
+    """
+    try:
+        msw = _STORE["model_serializer_webhook_instances"][serializer_class]
+    except KeyError:
+        return serializer_class.Meta.model.objects.all()
+    return msw.get_queryset()
+
+
+def queue_session_batch(items: list[tuple], countdown: int | None = None):
+    """
+    Queue `dispatch_session_batch` tasks for the events of a session,
+    one per `conf.SESSION_BATCH_SIZE` events regardless of the number of webhooks.
+    """
+    return [
+        dispatch_session_batch.apply_async(args=(chunk,), countdown=countdown)
+        for chunk in chunked(items, conf.SESSION_BATCH_SIZE)
+    ]
+
+
+def _reset_routes():
+    _STORE["model_routes"] = {}
+    _STORE["cascade_routes"] = {}
+    for msw in _STORE["model_serializer_webhook_instances"].values():
+        for model in msw.watched_models:
+            get_routes(model)
+
+
+def get_routes(model: Type[models.Model]) -> tuple[Route, ...]:
+    """
+    Return the webhooks (and the registered model they watch) that care about signals sent for `model`.
+
+    Subclasses (multi-table inheritance) and proxies of a watched model are routed to the same webhooks.
+    Results are memoized until the next `register_webhook` / `unregister_webhook`.
+    """
+    routes = _STORE["model_routes"]
+    try:
+        return routes[model]
+    except KeyError:
+        pass
+
+    concrete_model = model._meta.concrete_model
+    routes[model] = tuple(
+        Route(msw, watched_model)
+        for msw in _STORE["model_serializer_webhook_instances"].values()
+        for watched_model in msw.watched_models
+        if issubclass(concrete_model, watched_model._meta.concrete_model)  # type: ignore
+    )
+    return routes[model]
+
+
+# Relations along which a delete never removes the related rows
+_NON_CASCADING = (models.DO_NOTHING, models.PROTECT, models.SET_NULL, models.SET_DEFAULT)
+
+
+def cascades_to_routes(model: Type[models.Model]) -> bool:
+    """
+    Whether deleting an instance of `model` may delete instances of other models that are routed to webhooks,
+    following the relations Django's deletion collector cascades along.
+    Memoized until the next `register_webhook` / `unregister_webhook`, like `get_routes`.
+    """
+    memo = _STORE["cascade_routes"]
+    try:
+        return memo[model]
+    except KeyError:
+        pass
+
+    concrete_model = model._meta.concrete_model
+    seen = {concrete_model}
+    pending = [concrete_model]
+    reaches = False
+    while pending and not reaches:
+        opts = pending.pop()._meta
+        # Multi-table inheritance parents are deleted along with their children
+        related = list(opts.parents)
+        for field in opts.get_fields(include_hidden=True):
+            if field.auto_created and not field.concrete and (field.one_to_one or field.one_to_many):
+                if field.field.remote_field.on_delete not in _NON_CASCADING:
+                    related.append(field.related_model)
+            elif hasattr(field, 'bulk_related_objects'):  # Generic relations
+                related.append(field.related_model)
+
+        for related_model in related:
+            related_model = related_model._meta.concrete_model
+            if related_model in seen:
+                continue
+            seen.add(related_model)
+            if get_routes(related_model):
+                reaches = True
+                break
+            pending.append(related_model)
+
+    memo[model] = reaches
+    return reaches
@@ -0,0 +1,31 @@
+import asyncio
+import signal
+from contextlib import suppress
+
+from django.core.management.base import BaseCommand
+
+from drf_webhooks.delivery import AsyncDeliveryEngine
+
+
+class Command(BaseCommand):
+    help = "Send pending webhook requests with an asyncio engine (requires DELIVERY_BACKEND = 'asyncio')"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, help="Maximum number of requests in flight")
+        parser.add_argument('--per-host', type=int, help="Maximum number of requests in flight per host")
+        parser.add_argument('--once', action='store_true', help="Exit when there is nothing left to send")
+
+    def handle(self, *args, **options):
+        engine = AsyncDeliveryEngine(
+            concurrency=options['concurrency'],
+            per_host=options['per_host'],
+        )
+        asyncio.run(self._run(engine, options['once']))
+
+    async def _run(self, engine: AsyncDeliveryEngine, once: bool):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            with suppress(NotImplementedError):
+                loop.add_signal_handler(sig, engine.stop)
+
+        await engine.run(once=once)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from drf_webhooks.config import conf
+from drf_webhooks.subscriptions import sync_subscriptions
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the webhook subscription table from the webhooks' events (requires SUBSCRIPTION_TABLE = True), "
+        "e.g. after enabling it or after updating webhooks with `QuerySet.update`"
+    )
+
+    def handle(self, *args, **options):
+        webhooks = conf.WEBHOOK_MODEL.objects.only('pk', 'events', conf.OWNER_FIELD)
+        created = sync_subscriptions(webhooks.iterator(chunk_size=conf.MAX_QUERY_PARAMS))
+        self.stdout.write(f"Synced {created} subscriptions")
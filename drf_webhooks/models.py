@@ -39,6 +39,15 @@ class AbstractWebhook(models.Model):
     )
     target_headers = models.JSONField(default=dict)
 
+    # Seconds, defaults to `HTTP_CONNECT_TIMEOUT` / `HTTP_READ_TIMEOUT` settings
+    connect_timeout = models.FloatField(null=True, blank=True)
+    read_timeout = models.FloatField(null=True, blank=True)
+
+    # Send up to `max_batch_size` events as a list in one request, after at most `max_batch_wait` seconds
+    # (default: `BATCH_MAX_WAIT` setting). Events are sent one by one when not set.
+    max_batch_size = models.PositiveIntegerField(null=True, blank=True)
+    max_batch_wait = models.FloatField(null=True, blank=True)
+
     def __str__(self):
         return 'id=%s, events=%s' % (self.id, ', '.join(self.events))
 
@@ -64,6 +73,7 @@ class AbstractWebhookLogEntry(models.Model):
 
     req_dt = models.DateTimeField(null=True, blank=True, db_index=True)
     req_url = models.URLField(max_length=255, db_index=True)
+    req_host = models.CharField(max_length=255, blank=True)
     req_method = models.CharField(max_length=6, db_index=True)
     req_headers = models.JSONField()
     req_data = models.JSONField(null=True, blank=True)
@@ -78,6 +88,21 @@ class AbstractWebhookLogEntry(models.Model):
     error_code = models.CharField(max_length=100, blank=True, db_index=True)
     error_message = models.TextField(blank=True)
 
+    # Rendered but not sent yet, see the `deliver_webhooks` management command
+    pending = models.BooleanField(default=False, db_index=True)
+    # Set while the request is being sent by `deliver_webhooks`, stale claims are queued again
+    claimed_dt = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    # Events of batching webhooks wait for a batch, the batch's log entry holds the request and response
+    awaiting_batch = models.BooleanField(default=False, db_index=True)
+    batch = models.ForeignKey(
+        'self',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="batch_entries",
+    )
+
     def __str__(self) -> str:
         return f'{self.req_dt}: {self.event}'
 
@@ -88,3 +113,58 @@ class AbstractWebhookLogEntry(models.Model):
         verbose_name = _("webhook log entry")
         verbose_name_plural = _("webhook log")
         abstract = True
+
+
+class AbstractWebhookSubscription(models.Model):
+    """
+    One row per event of a webhook (with `SUBSCRIPTION_TABLE = True`), so subscriptions are resolved with
+    an indexed equality lookup instead of scanning `AbstractWebhook.events`.
+    Kept in sync with `events` on save, `sync_webhook_subscriptions` rebuilds it after bulk updates.
+
+    Subclasses add the owner field (see `OWNER_FIELD`) and an index on (owner, event).
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    webhook = models.ForeignKey(
+        conf.WEBHOOK_MODEL_NAME,
+        on_delete=models.CASCADE,
+        related_name="subscriptions",
+    )
+    event = models.CharField(max_length=128)
+
+    def __str__(self) -> str:
+        return f'{self.webhook_id}: {self.event}'
+
+    def __repr__(self):
+        return '<%s: %s>' % (self.__class__.__name__, self)
+
+    class Meta:
+        verbose_name = _("webhook subscription")
+        verbose_name_plural = _("webhook subscriptions")
+        abstract = True
+
+
+class AbstractWebhookOutboxEvent(models.Model):
+    """
+    Events stored by `WebhookSignalSession` in the same transaction as the changes that caused them
+    (with `OUTBOX = True`), until `relay_webhook_outbox` queues them for delivery
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    dt_created = models.DateTimeField(auto_now_add=True)
+
+    event = models.CharField(max_length=64)
+    owner_pk = models.JSONField()
+    object_id = models.CharField(max_length=255)
+    webhook_ids = models.JSONField()
+
+    def __str__(self) -> str:
+        return f'{self.dt_created}: {self.event}'
+
+    def __repr__(self):
+        return '<%s: %s>' % (self.__class__.__name__, self)
+
+    class Meta:
+        verbose_name = _("webhook outbox event")
+        verbose_name_plural = _("webhook outbox")
+        abstract = True
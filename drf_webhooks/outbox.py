@@ -0,0 +1,75 @@
+import logging
+from typing import TYPE_CHECKING, Iterable
+
+from django.db import models, transaction
+
+from .config import conf
+
+if TYPE_CHECKING:
+    from drf_webhooks.main import ModelSerializerWebhook, WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+
+def write_outbox(events: Iterable["WebhookEvent"]) -> list[models.Model]:
+    """
+    Store events in the outbox with a single `bulk_create`.
+    Runs in the caller's transaction, events are rolled back along with the changes that caused them.
+    """
+    model = conf.WEBHOOK_OUTBOX_MODEL
+    return model.objects.bulk_create(
+        [
+            model(
+                event=e.event,
+                owner_pk=e.owner_id,
+                object_id=e.object_id,
+                webhook_ids=list(e.webhook_ids),
+            )
+            for e in events
+        ]
+    )
+
+
+def relay_outbox(batch_size: int | None = None) -> int:
+    """
+    Queue the oldest `batch_size` (default: `conf.OUTBOX_BATCH_SIZE`) outbox events for delivery
+    according to `conf.DISPATCH_MODE` and remove them from the outbox. Returns the number of relayed events.
+
+    Rows locked by another relay are skipped. If queueing fails the rows stay in the outbox,
+    if the commit fails after queueing they are relayed again (at least once delivery).
+    """
+    from .main import _STORE, WebhookEvent  # main imports this module
+
+    model = conf.WEBHOOK_OUTBOX_MODEL
+    webhooks = {msw.base_name: msw for msw in _STORE["model_serializer_webhook_instances"].values()}
+
+    with transaction.atomic():
+        rows = list(
+            model.objects.select_for_update(skip_locked=True).order_by('pk')[: batch_size or conf.OUTBOX_BATCH_SIZE]
+        )
+
+        events: dict["ModelSerializerWebhook", list[WebhookEvent]] = {}
+        for row in rows:
+            base_name, cud = row.event.rsplit('.', 1)
+            try:
+                msw = webhooks[base_name]
+            except KeyError:
+                logger.warning(f"Dropped outbox event {row.event} for {row.object_id}. No webhook is registered for it")
+                continue
+
+            events.setdefault(msw, []).append(
+                WebhookEvent(
+                    event=row.event,
+                    owner_id=row.owner_pk,
+                    object_id=row.object_id,
+                    webhook_ids=tuple(row.webhook_ids),
+                    serializer_class_module=msw.serializer_module_path if cud != "deleted" else None,
+                )
+            )
+
+        for msw, webhook_events in events.items():
+            msw._enqueue(webhook_events)
+
+        model.objects.filter(pk__in=[row.pk for row in rows]).delete()
+
+    return len(rows)
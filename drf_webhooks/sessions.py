@@ -1,71 +1,619 @@
-from collections import deque
 from contextlib import contextmanager
+from contextvars import ContextVar
+from copy import deepcopy
+from datetime import date, time, timedelta
+from decimal import Decimal
+from functools import partial
+from typing import Callable, Hashable, Iterable, Iterator
+from uuid import UUID
 
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models.deletion import Collector
 
-from drf_webhooks.main import _STORE, Signal, WebhookCUD
+from drf_webhooks.config import conf
+from drf_webhooks.main import (
+    _STORE,
+    ModelSerializerWebhook,
+    Route,
+    Signal,
+    WebhookCUD,
+    WebhookEvent,
+    cascades_to_routes,
+    get_routes,
+    queue_session_batch,
+)
+from drf_webhooks.outbox import write_outbox
+from drf_webhooks.utils import chunked
+
+# Stack of open sessions for the current thread / asyncio task.
+# Tuples are used so that a copied context (e.g. `asgiref.sync_to_async`) can never mutate the parent's stack.
+_session_stack: ContextVar[tuple["WebhookSignalSession", ...]] = ContextVar("drf_webhooks_session_stack", default=())
+
+
+def get_current_session() -> "WebhookSignalSession | None":
+    stack = _session_stack.get()
+    return stack[-1] if stack else None
+
+
+class _SignalRecord:
+    """
+    Merged state of every signal for one instance
+    """
+
+    __slots__ = ('instance', 'created', 'deleted', 'update_fields')
+
+    def __init__(self, instance: models.Model | None):
+        self.instance = instance
+        self.created = False
+        self.deleted = False
+        # Fields saved by updates, `None` if any field may have changed
+        self.update_fields: frozenset[str] | None = frozenset()
+
+
+class SignalBuffer:
+    """
+    Signals of a session, deduplicated on insert by (model, pk).
+
+    Instances are only kept when a webhook needs them to resolve the change (base models, custom getters
+    and deleted instances), nested models resolved with `__in` lookups are stored by primary key.
+    Iterating yields the `Signal`s the merged records stand for.
+    """
+
+    def __init__(self):
+        self._records: dict[type[models.Model], dict[Hashable, _SignalRecord]] = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self) -> Iterator[Signal]:
+        for model, records in self._records.items():
+            yield from self.model_signals(model, records)
+
+    def add(
+        self,
+        model: type[models.Model],
+        pk: Hashable,
+        cud: WebhookCUD,
+        instance: models.Model | None = None,
+        update_fields: frozenset[str] | None = None,
+    ):
+        records = self._records.setdefault(model, {})
+        record = records.get(pk)
+        if record is None:
+            record = records[pk] = _SignalRecord(instance)
+            self._size += 1
+        elif instance is not None:
+            # The latest instance is serialized
+            record.instance = instance
+
+        if cud == 'created':
+            record.created = True
+            record.update_fields = None
+        elif cud == 'deleted':
+            record.deleted = True
+        elif record.update_fields is not None:
+            record.update_fields = None if update_fields is None else record.update_fields | update_fields
+
+    def extend(self, other: "SignalBuffer"):
+        for model, records in other._records.items():
+            for pk, record in records.items():
+                if record.created:
+                    self.add(model, pk, 'created', record.instance)
+                if record.deleted:
+                    self.add(model, pk, 'deleted', record.instance)
+                if not record.created and not record.deleted:
+                    self.add(model, pk, 'updated', record.instance, record.update_fields)
+
+    def clear(self):
+        self._records = {}
+        self._size = 0
+
+    def by_model(self) -> Iterator[tuple[type[models.Model], Iterator[Signal]]]:
+        for model, records in self._records.items():
+            yield model, self.model_signals(model, records)
+
+    @staticmethod
+    def model_signals(model: type[models.Model], records: dict[Hashable, _SignalRecord]) -> Iterator[Signal]:
+        for pk, record in records.items():
+            if record.created:
+                yield Signal(record.instance, pk, 'created')
+            if record.deleted:
+                yield Signal(record.instance, pk, 'deleted')
+            if not record.created and not record.deleted:
+                yield Signal(record.instance, pk, 'updated', record.update_fields)
+
+
+# Routes -> whether the instance is needed to resolve changes
+_keeps_instances: dict[tuple[Route, ...], bool] = {}
+
+
+def _keeps_instance(routes: tuple[Route, ...]) -> bool:
+    try:
+        return _keeps_instances[routes]
+    except KeyError:
+        pass
+
+    _keeps_instances[routes] = any(model is msw.model or model not in msw.plan.query_names for msw, model in routes)
+    return _keeps_instances[routes]
+
+
+def _requires_instance(routes: tuple[Route, ...]) -> bool:
+    # Custom getters are called with the instance, base models are loaded by primary key when flushed
+    return any(model is not msw.model and model not in msw.plan.query_names for msw, model in routes)
+
+
+class _UncommittedBatch:
+    """
+    Signals collected at one savepoint level of a transaction.
+    Django drops the batch's `on_commit` callback if that savepoint is rolled back.
+    """
+
+    __slots__ = ('savepoint_ids', 'signals', 'callback')
+
+    def __init__(self, savepoint_ids: tuple[str, ...]):
+        self.savepoint_ids = savepoint_ids
+        self.signals = SignalBuffer()
+        self.callback: Callable = lambda: None
+
+
+def _is_pending(using: str, callback: Callable) -> bool:
+    # Callbacks are dropped when their transaction or savepoint is rolled back, and cleared once run
+    return any(entry[1] is callback for entry in reversed(transaction.get_connection(using).run_on_commit))
 
 
 class WebhookSignalSession:
     """
     Collect all signals in a session and send them to ModelSerializerWebhook instances
     to minimize the number of webhook events
+
+    Sessions can be nested. Signals are always collected by the innermost open session
+    and are handed over to the enclosing session when the inner session is closed.
+
+    Signals sent inside a transaction are only kept once it commits, signals from rolled back
+    savepoints are dropped. The outermost session is flushed after the commit, so tasks never race it.
+    With `OUTBOX` enabled the signals still pending in open transactions when the session closes are written
+    to the outbox in those transactions instead, so the outbox rows roll back along with the changes.
+
+    Once `SESSION_MAX_SIGNALS` instances are buffered they are flushed early, to bound the memory of large sessions.
+    Changes inside a transaction are then resolved right away and queued once it commits.
     """
 
     def __init__(self):
-        self._signals: deque[Signal] = deque()
-        models.signals.post_save.connect(self._post_save)
-        models.signals.m2m_changed.connect(self._m2m_changed)
-        models.signals.pre_delete.connect(self._pre_delete)
+        self._signals = SignalBuffer()
+        # Database alias -> batch of the current savepoint level
+        self._uncommitted: dict[str, _UncommittedBatch] = {}
+        self._closed = False
+        self._flush_pending = False
+        self._parent: WebhookSignalSession | None = None
+        # The delete whose cascade was last resolved, and the owner pks it captured for deleted base instances
+        self._deletion_origin: models.Model | models.QuerySet | None = None
+        self._deletion_collected = False
+        self._deleted_owners: dict[tuple[type[models.Model], Hashable], dict[ModelSerializerWebhook, Hashable]] = {}
+        _session_stack.set((*_session_stack.get(), self))
 
-    def _post_save(self, sender, instance: models.Model, created: bool, **kwargs):
+    def _post_save(
+        self,
+        sender,
+        instance: models.Model,
+        created: bool,
+        update_fields: frozenset[str] | None = None,
+        **kwargs,
+    ):
         if _STORE['disable_webhooks']:
             return
+
+        if conf.TRACK_FIELD_CHANGES:
+            changed_fields = _get_changed_fields(instance)
+            if not created and update_fields is None:
+                update_fields = changed_fields
+
         if created:
             self.created(instance)
         else:
-            self.updated(instance)
+            self.updated(instance, update_fields)
 
-    def _pre_delete(self, sender, instance: models.Model, **kwargs):
+    def _pre_delete(self, sender, instance: models.Model, origin=None, **kwargs):
         if _STORE['disable_webhooks']:
             return
-        self.deleted(instance)
+        self.deleted(instance, origin)
 
-    def _collect(self, instance: models.Model, cud: WebhookCUD):
-        self._signals.append(Signal(instance, instance.pk, cud))
+    def _collect(self, instance: models.Model, cud: WebhookCUD, update_fields: frozenset[str] | None = None):
+        model = instance.__class__
+        keep = cud == 'deleted' or _keeps_instance(get_routes(model))
+        self._add(model, instance.pk, cud, instance if keep else None, update_fields, instance._state.db)
+
+    def _add(
+        self,
+        model: type[models.Model],
+        pk: Hashable,
+        cud: WebhookCUD,
+        instance: models.Model | None = None,
+        update_fields: frozenset[str] | None = None,
+        using: str | None = None,
+    ):
+        # Models no webhook serializes are dropped before taking up room or registering `on_commit` callbacks
+        if not get_routes(model):
+            return
+
+        using = using or DEFAULT_DB_ALIAS
+        connection = transaction.get_connection(using)
+        if not connection.in_atomic_block:
+            self._signals.add(model, pk, cud, instance, update_fields)
+            if conf.SESSION_MAX_SIGNALS and len(self._signals) >= conf.SESSION_MAX_SIGNALS:
+                self.flush()
+            return
+
+        savepoint_ids = tuple(connection.savepoint_ids)
+        batch = self._uncommitted.get(using)
+        if batch is None or batch.savepoint_ids != savepoint_ids or not _is_pending(using, batch.callback):
+            batch = _UncommittedBatch(savepoint_ids)
+            batch.callback = partial(self._committed, batch)
+            self._uncommitted[using] = batch
+            transaction.on_commit(batch.callback, using=using)
+
+        batch.signals.add(model, pk, cud, instance, update_fields)
+        if conf.SESSION_MAX_SIGNALS and len(batch.signals) >= conf.SESSION_MAX_SIGNALS:
+            signals, batch.signals = batch.signals, SignalBuffer()
+            # Resolved while the changes are visible, queued (or dropped) with the savepoint
+            events = _resolve_events(_route(signals))
+            if conf.OUTBOX:
+                write_outbox(e for webhook_events in events.values() for e in webhook_events)
+            else:
+                transaction.on_commit(partial(_queue_events, events), using=using)
+
+    def _committed(self, batch: _UncommittedBatch):
+        # Nested sessions hand over to the enclosing session, even after they have been closed
+        session = self
+        while session._closed and session._parent is not None:
+            session = session._parent
+
+        session._signals.extend(batch.signals)
+        batch.signals = SignalBuffer()
+
+        if session._closed and not session._flush_pending:
+            session.flush()
 
     def created(self, instance: models.Model):
         self._collect(instance, "created")
 
-    def updated(self, instance: models.Model):
-        self._collect(instance, "updated")
+    def updated(self, instance: models.Model, update_fields: Iterable[str] | None = None):
+        """
+        With `update_fields`, the signal is dropped for webhooks that don't serialize any of them
+        """
+        if update_fields is not None:
+            update_fields = frozenset(update_fields)
+            if not any(msw.watches(model, update_fields) for msw, model in get_routes(instance.__class__)):
+                return
+
+        self._collect(instance, "updated", update_fields)
+
+    def created_many(self, instances: Iterable[models.Model]):
+        """
+        Record instances created with `bulk_create`, which sends no signals.
+        Their primary keys must be set (e.g. PostgreSQL).
+        """
+        for instance in instances:
+            self.created(instance)
+
+    def updated_many(self, instances: Iterable[models.Model], update_fields: Iterable[str] | None = None):
+        """
+        Record instances saved with `bulk_update(instances, update_fields)`, which sends no signals
+        """
+        if update_fields is not None:
+            update_fields = frozenset(update_fields)
+        for instance in instances:
+            self.updated(instance, update_fields)
+
+    def updated_queryset(self, queryset: models.QuerySet, update_fields: Iterable[str] | None = None):
+        """
+        Record the rows of `queryset` as updated, e.g. before or after calling `queryset.update(**update_fields)`.
+        Only primary keys are fetched, unless a custom getter needs the instances.
+        The queryset is evaluated right away, so call it while it still matches the rows.
+        """
+        model = queryset.model
+        routes = get_routes(model)
+        if update_fields is not None:
+            update_fields = frozenset(update_fields)
+            routes = tuple(route for route in routes if route.webhook.watches(route.model, update_fields))
+        if not routes:
+            return
+
+        if _requires_instance(routes):
+            for instance in queryset.iterator(chunk_size=conf.MAX_QUERY_PARAMS):
+                self._add(model, instance.pk, 'updated', instance, update_fields, queryset.db)
+            return
+
+        for pk in queryset.values_list('pk', flat=True).iterator(chunk_size=conf.MAX_QUERY_PARAMS):
+            self._add(model, pk, 'updated', None, update_fields, queryset.db)
+
+    def deleted_pks(self, model: type[models.Model], pks: Iterable[Hashable], using: str | None = None):
+        """
+        Record rows that are about to be deleted with `QuerySet.delete()` or raw SQL, which send no `pre_delete`.
+        Must be called before the rows are deleted. Instances are only loaded for models that webhooks serialize,
+        to remember their owners, or that custom base getters are called with.
+        """
+        routes = get_routes(model)
+        if not routes:
+            return
+
+        load = _keeps_instance(routes)
+        for chunk in chunked(pks, conf.MAX_QUERY_PARAMS):
+            if load:
+                instances = list(model._default_manager.using(using).filter(pk__in=chunk))
+            else:
+                # Query paths only need primary keys
+                instances = [model(pk=pk) for pk in chunk]
+            self._resolve_deleted(model, instances, using)
+            for instance in instances:
+                self._add_deleted(instance, instance if load else None, using)
 
     def _m2m_changed(self, sender, instance: models.Model, action: str, **kwargs):
         if action.startswith("post_"):  # post_add, post_remove, post_clear
             self.updated(instance)
 
-    def deleted(self, instance: models.Model):
-        self._collect(instance, "deleted")
+    def deleted(self, instance: models.Model, origin: models.Model | models.QuerySet | None = None):
+        """
+        Record an instance that is about to be deleted.
+
+        Owners and the base instances serializing it as a nested instance must be resolved while the rows still
+        exist. `pre_delete` passes the `origin` of the delete. When its cascade can reach models routed to webhooks,
+        the whole cascade is collected and resolved with set based queries at its first instance, instead of
+        once per deleted row.
+        """
+        model = instance.__class__
+        using = instance._state.db or DEFAULT_DB_ALIAS
+        if origin is not None and origin is not self._deletion_origin:
+            self._deletion_origin = origin
+            self._deleted_owners = {}
+            self._deletion_collected = self._collect_deletion(origin, using)
+
+        if origin is None or not self._deletion_collected:
+            self._resolve_deleted(model, [instance], using)
+
+        self._add_deleted(instance, instance, using)
+
+    def _collect_deletion(self, origin: models.Model | models.QuerySet, using: str) -> bool:
+        # Collecting repeats the cascade queries of the delete, only done if they are needed
+        if isinstance(origin, models.QuerySet):
+            worth_it = bool(get_routes(origin.model)) or cascades_to_routes(origin.model)
+        else:
+            worth_it = cascades_to_routes(origin.__class__)
+        if not worth_it:
+            return False
+
+        collector = Collector(using=using, origin=origin)
+        collector.collect(origin if isinstance(origin, models.QuerySet) else [origin])
+        for collected_model, instances in collector.data.items():
+            self._resolve_deleted(collected_model, list(instances), collector.using)
+        return True
+
+    def _add_deleted(self, instance: models.Model, keep: models.Model | None, using: str | None):
+        owners = self._deleted_owners.pop((instance.__class__, instance.pk), None)
+        if owners:
+            setattr(instance, '_webhook_owners', owners)
+        self._add(instance.__class__, instance.pk, 'deleted', keep, None, using)
+
+    def _resolve_deleted(self, model: type[models.Model], instances: list[models.Model], using: str | None):
+        """
+        Capture the owners of deleted base instances and record the base instances that reference deleted
+        nested instances as updated, with one `__in` query per (model, webhook) and query path.
+        """
+        for msw, route_model in get_routes(model):
+            if route_model is msw.model:
+                for pk, owner_pk in msw.get_owners(instances).items():
+                    self._deleted_owners.setdefault((model, pk), {})[msw] = owner_pk
+                continue
 
-        # This has be get done while these objects still exist:
-        for msw in _STORE["model_serializer_webhook_instances"].values():
-            if isinstance(instance, msw.model):
-                setattr(instance, '_cached_owner', msw.get_owner(instance))
+            if not msw.update:
+                continue
 
-            # FIXME: This wasn't working but the unit tests didn't catch it
-            # base_getters = msw.get_signal_model_instance_base_getters()
-            # try:
-            #     base_instances = base_getters[instance.__class__](instance)
-            # except KeyError:
-            #     continue
-            # for inst in msw.model.objects.filter(base_instances):
-            #     self.updated(inst)
+            if route_model in msw.plan.query_names:
+                affected_pks = msw._iter_nested_affected_pks({route_model: [i.pk for i in instances]})
+            else:
+                getter = msw.plan.base_getters[route_model]
+                affected_pks = msw._find_affected_pks({}, [getter(i) for i in instances])
+
+            for pk in affected_pks:
+                self._add(msw.model, pk, 'updated', None, None, using)
 
     def close(self):
-        for swh in _STORE["model_serializer_webhook_instances"].values():
-            swh._exec(self._signals)
-        # Clear
-        self._signals = deque()
+        if self._closed:
+            return
+        self._closed = True
+
+        stack = _session_stack.get()
+        _session_stack.set(tuple(s for s in stack if s is not self))
+        index = stack.index(self) if self in stack else 0
+
+        # Nested session: let the enclosing session deduplicate and dispatch
+        if index > 0:
+            self._parent = stack[index - 1]
+            self._parent._signals.extend(self._signals)
+            self._signals = SignalBuffer()
+            return
+
+        if conf.OUTBOX:
+            # Written in the open transactions, so they roll back with them. Batches of rolled back savepoints
+            # are gone from `run_on_commit`, batches committed since have been handed over already
+            for using in self._uncommitted:
+                for batch in self._pending_batches(using):
+                    self._signals.extend(batch.signals)
+                    batch.signals = SignalBuffer()
+            self.flush()
+            return
+
+        pending = [using for using, batch in self._uncommitted.items() if _is_pending(using, batch.callback)]
+        if not pending:
+            self.flush()
+            return
+
+        # Flushed after the signals collected in the transaction have been committed
+        self._flush_pending = True
+        for using in pending:
+            transaction.on_commit(self._flush_committed, using=using)
+
+    def _pending_batches(self, using: str) -> list[_UncommittedBatch]:
+        # Batches of this session and of the nested sessions that handed over to it
+        batches = []
+        for entry in transaction.get_connection(using).run_on_commit:
+            callback = entry[1]
+            if (
+                not isinstance(callback, partial)
+                or getattr(callback.func, '__func__', None) is not type(self)._committed
+            ):
+                continue
+            session = callback.func.__self__
+            while session is not self and session._parent is not None:
+                session = session._parent
+            if session is self:
+                batches.append(callback.args[0])
+        return batches
+
+    def _flush_committed(self):
+        self._flush_pending = False
+        self.flush()
+
+    def flush(self):
+        signals, self._signals = self._signals, SignalBuffer()
+        buckets = _route(signals)
+
+        if conf.OUTBOX:
+            # One insert for the whole session
+            write_outbox(e for events in _resolve_events(buckets).values() for e in events)
+            return
+
+        if conf.DISPATCH_MODE == 'session':
+            _queue_events(_resolve_events(buckets))
+            return
+
+        for msw, model_signals in buckets.items():
+            msw._exec(model_signals)
+
+
+SignalBuckets = dict[ModelSerializerWebhook, dict[type[models.Model], list[Signal]]]
+
+
+def _route(signals: SignalBuffer) -> SignalBuckets:
+    # Bucket every signal once, so each webhook only sees the signals it watches
+    buckets: SignalBuckets = {}
+    for signal_model, model_signals in signals.by_model():
+        routes = get_routes(signal_model)
+        for signal in model_signals:
+            for msw, model in routes:
+                if signal.update_fields is None or msw.watches(model, signal.update_fields):
+                    buckets.setdefault(msw, {}).setdefault(model, []).append(signal)
+    return buckets
+
+
+def _resolve_events(buckets: SignalBuckets) -> dict[ModelSerializerWebhook, list[WebhookEvent]]:
+    return {msw: msw._get_events(msw._resolve_changes(model_signals)) for msw, model_signals in buckets.items()}
+
+
+def _queue_events(events: dict[ModelSerializerWebhook, list[WebhookEvent]]):
+    if conf.DISPATCH_MODE != 'session':
+        for msw, webhook_events in events.items():
+            msw._enqueue(webhook_events)
+        return
+
+    # All webhooks of the session share the tasks, debounced events are delayed on their own
+    items = []
+    for msw, webhook_events in events.items():
+        webhook_events, debounced = msw._debounce(webhook_events)
+        items.extend(msw._get_session_batch_items(webhook_events))
+        msw._enqueue_debounced(debounced)
+    queue_session_batch(items)
+
+
+# Routes -> attnames of the fields to snapshot
+_tracked_attnames: dict[tuple[Route, ...], tuple[str, ...]] = {}
+
+
+def _get_tracked_attnames(routes: tuple[Route, ...]) -> tuple[str, ...]:
+    try:
+        return _tracked_attnames[routes]
+    except KeyError:
+        pass
+
+    attnames: set[str] = set()
+    for msw, model in routes:
+        fields = msw.plan.watched_fields.get(model)
+        if fields is None:
+            attnames = {f.attname for f in model._meta.concrete_fields}
+            break
+        attnames.update(f.attname for f in model._meta.concrete_fields if f.name in fields or f.attname in fields)
+
+    _tracked_attnames[routes] = tuple(attnames)
+    return _tracked_attnames[routes]
+
+
+# Values that can't be changed in place are kept as they are, anything else (JSON, arrays, ...) is copied
+_IMMUTABLE_TYPES = (str, int, float, bool, bytes, type(None), Decimal, date, time, timedelta, UUID)
+
+
+def _snapshot(instance: models.Model, routes: tuple[Route, ...]):
+    values = instance.__dict__
+    # Deferred fields are left out
+    instance._webhook_snapshot = {  # type: ignore
+        a: values[a] if isinstance(values[a], _IMMUTABLE_TYPES) else deepcopy(values[a])
+        for a in _get_tracked_attnames(routes)
+        if a in values
+    }
+
+
+def _get_changed_fields(instance: models.Model) -> frozenset[str] | None:
+    """
+    Watched fields that changed since the instance was loaded or last saved, `None` if unknown.
+    Takes a new snapshot.
+    """
+    routes = get_routes(instance.__class__)
+    if not routes:
+        return None
+
+    snapshot = getattr(instance, '_webhook_snapshot', None)
+    _snapshot(instance, routes)
+    if snapshot is None:
+        return None
+
+    values = instance.__dict__
+    return frozenset(a for a, value in snapshot.items() if values.get(a, value) != value)
+
+
+def _post_init(sender, instance: models.Model, **kwargs):
+    routes = get_routes(sender)
+    if routes:
+        _snapshot(instance, routes)
+
+
+def _post_save(sender, **kwargs):
+    session = get_current_session()
+    if session is not None:
+        session._post_save(sender, **kwargs)
+
+
+def _m2m_changed(sender, **kwargs):
+    session = get_current_session()
+    if session is not None:
+        session._m2m_changed(sender, **kwargs)
+
+
+def _pre_delete(sender, **kwargs):
+    session = get_current_session()
+    if session is not None:
+        session._pre_delete(sender, **kwargs)
+
+
+def connect_signals():
+    """
+    Connect the process wide receivers that route model signals to the current session.
+    Called once from `AppConfig.ready()`. Connecting multiple times is a no-op.
+    """
+    models.signals.post_save.connect(_post_save, dispatch_uid="drf_webhooks.sessions._post_save")
+    models.signals.m2m_changed.connect(_m2m_changed, dispatch_uid="drf_webhooks.sessions._m2m_changed")
+    models.signals.pre_delete.connect(_pre_delete, dispatch_uid="drf_webhooks.sessions._pre_delete")
+    if conf.TRACK_FIELD_CHANGES:
+        # Runs for every instance of a watched model that is loaded, so it's opt-in
+        models.signals.post_init.connect(_post_init, dispatch_uid="drf_webhooks.sessions._post_init")
 
 
 @contextmanager
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent with `webhook` (the `ModelSerializerWebhook`), `size` (number of base instances a session's nested changes
+# resolved to) and `background` (whether they were dispatched by `dispatch_nested_changes` after exceeding
+# `max_fan_out`). In the background it is sent once all affected instances were dispatched.
+nested_fan_out = Signal()
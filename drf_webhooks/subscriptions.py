@@ -0,0 +1,303 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Hashable, Iterable, Mapping
+from uuid import uuid4
+
+from django.core.cache import caches
+from django.db import models, transaction
+from pytimeparse.timeparse import timeparse
+
+from .config import conf
+from .events import get_candidate_patterns, get_matcher
+from .utils import chunked
+
+SubscriptionKey = tuple[Hashable, str]  # (owner_pk, event)
+
+
+class SubscriptionCache:
+    """
+    Caches the webhook ids subscribed to (owner_pk, event) pairs.
+    An empty tuple is a negative entry: the owner has no webhooks for that event.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self) -> Hashable:
+        """
+        Token that changes on every invalidation.
+        Results read from the database before an invalidation must not be written back afterwards.
+        """
+        raise NotImplementedError
+
+    def get_many(self, keys: Iterable[SubscriptionKey]) -> dict[SubscriptionKey, tuple[str, ...]]:
+        raise NotImplementedError
+
+    def set_many(self, entries: Mapping[SubscriptionKey, tuple[str, ...]], generation: Hashable):
+        raise NotImplementedError
+
+    def invalidate(self, owner_pk: Hashable, webhook_id: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class LocalSubscriptionCache(SubscriptionCache):
+    """
+    Size bounded LRU cache in process memory.
+
+    Invalidation only reaches the process where the webhook was changed,
+    other processes rely on the TTL.
+    """
+
+    def __init__(self, ttl: int, max_size: int):
+        super().__init__(ttl)
+        self.max_size = max_size
+        self._entries: OrderedDict[SubscriptionKey, tuple[float, tuple[str, ...]]] = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self):
+        return self._generation
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None or entry[0] < now:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[1]
+                self.hits += 1
+        return found
+
+    def set_many(self, entries, generation):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            if generation != self._generation:
+                return
+            for key, webhook_ids in entries.items():
+                self._entries[key] = (expires, webhook_ids)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, owner_pk, webhook_id):
+        with self._lock:
+            self._generation += 1
+            # The webhook might have been moved away from another owner, so entries referencing it go as well
+            stale = [
+                key
+                for key, (_, webhook_ids) in self._entries.items()
+                if key[0] == owner_pk or webhook_id in webhook_ids
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+class DjangoSubscriptionCache(SubscriptionCache):
+    """
+    Stores entries in a Django cache backend, shared between processes.
+    Size bounds and eviction are left to the backend.
+
+    Every change to a webhook invalidates all entries by rotating a generation token,
+    which is part of every key.
+    """
+
+    generation_key = 'drf_webhooks:subscriptions:generation'
+
+    def __init__(self, ttl: int, alias: str):
+        super().__init__(ttl)
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def generation(self):
+        generation = self.cache.get(self.generation_key)
+        if generation is None:
+            self.cache.add(self.generation_key, uuid4().hex, timeout=None)
+            generation = self.cache.get(self.generation_key)
+        return generation
+
+    def _make_key(self, generation: Hashable, key: SubscriptionKey):
+        owner_pk, event = key
+        return f'drf_webhooks:subscriptions:{generation}:{owner_pk}:{event}'
+
+    def get_many(self, keys):
+        generation = self.generation()
+        cache_keys = {self._make_key(generation, key): key for key in keys}
+        found = {cache_keys[k]: tuple(v) for k, v in self.cache.get_many(cache_keys.keys()).items()}
+        self.hits += len(found)
+        self.misses += len(cache_keys) - len(found)
+        return found
+
+    def set_many(self, entries, generation):
+        self.cache.set_many(
+            {self._make_key(generation, key): webhook_ids for key, webhook_ids in entries.items()},
+            timeout=self.ttl,
+        )
+
+    def invalidate(self, owner_pk, webhook_id):
+        self.clear()
+
+    def clear(self):
+        self.cache.set(self.generation_key, uuid4().hex, timeout=None)
+
+
+_subscription_caches: dict[tuple, SubscriptionCache] = {}
+
+
+def get_subscription_cache() -> SubscriptionCache | None:
+    """
+    Returns the cache configured with `conf.SUBSCRIPTION_CACHE`, or `None` if caching is disabled
+    """
+    if not conf.SUBSCRIPTION_CACHE:
+        return None
+
+    options = (conf.SUBSCRIPTION_CACHE, conf.SUBSCRIPTION_CACHE_TTL, conf.SUBSCRIPTION_CACHE_MAX_SIZE)
+    try:
+        return _subscription_caches[options]
+    except KeyError:
+        pass
+
+    ttl = timeparse(conf.SUBSCRIPTION_CACHE_TTL)
+    if conf.SUBSCRIPTION_CACHE == 'local':
+        cache: SubscriptionCache = LocalSubscriptionCache(ttl, conf.SUBSCRIPTION_CACHE_MAX_SIZE)
+    else:
+        cache = DjangoSubscriptionCache(ttl, conf.SUBSCRIPTION_CACHE)
+
+    _subscription_caches[options] = cache
+    return cache
+
+
+def _fetch_subscribed_webhook_ids(keys: Iterable[SubscriptionKey]) -> dict[SubscriptionKey, list[str]]:
+    events_by_owner: dict[Hashable, set[str]] = {}
+    for owner_pk, event in keys:
+        events_by_owner.setdefault(owner_pk, set()).add(event)
+
+    subscriptions: dict[SubscriptionKey, list[str]] = {}
+
+    for owner_pks in chunked(events_by_owner.keys(), conf.MAX_QUERY_PARAMS):
+        events = set().union(*(events_by_owner[owner_pk] for owner_pk in owner_pks))
+        # Webhooks subscribe with the events themselves or with wildcard patterns matching them
+        patterns = set().union(*(get_candidate_patterns(event) for event in events))
+
+        if conf.SUBSCRIPTION_TABLE:
+            # Equality lookups on the (owner, event) index, on any database
+            rows = conf.WEBHOOK_SUBSCRIPTION_MODEL.objects.filter(
+                **{f'{conf.OWNER_FIELD}__in': owner_pks},
+                event__in=patterns,
+            ).values_list('webhook_id', conf.OWNER_FIELD, 'event')
+
+            matched: dict[tuple[Hashable, str], set[str]] = {}
+            for webhook_id, owner_pk, pattern in rows:
+                matched.setdefault((owner_pk, str(webhook_id)), set()).add(pattern)
+            matches = ((owner_pk, webhook_id, get_matcher(found)) for (owner_pk, webhook_id), found in matched.items())
+        else:
+            rows = conf.WEBHOOK_MODEL.objects.filter(
+                **{f'{conf.OWNER_FIELD}__in': owner_pks},
+                events__overlap=list(patterns),
+            ).values_list('id', conf.OWNER_FIELD, 'events')
+            matches = ((owner_pk, str(webhook_id), get_matcher(found)) for webhook_id, owner_pk, found in rows)
+
+        for owner_pk, webhook_id, matcher in matches:
+            for event in matcher.match_many(events_by_owner[owner_pk]):
+                subscriptions.setdefault((owner_pk, event), []).append(webhook_id)
+
+    return subscriptions
+
+
+def get_subscribed_webhook_ids(keys: Iterable[SubscriptionKey]) -> dict[SubscriptionKey, tuple[str, ...]]:
+    """
+    Resolve the webhooks subscribed to each (owner_pk, event) pair.
+
+    Pairs missing from the subscription cache (if enabled) are resolved with one query
+    per chunk of `conf.MAX_QUERY_PARAMS` owners, instead of one query per affected instance.
+    """
+    keys = set(keys)
+    cache = get_subscription_cache()
+    if cache is None:
+        return {key: tuple(ids) for key, ids in _fetch_subscribed_webhook_ids(keys).items()}
+
+    generation = cache.generation()
+    subscriptions = cache.get_many(keys)
+    missing = keys - subscriptions.keys()
+    if missing:
+        fetched = _fetch_subscribed_webhook_ids(missing)
+        entries = {key: tuple(fetched.get(key, ())) for key in missing}
+        cache.set_many(entries, generation)
+        subscriptions.update(entries)
+
+    return {key: ids for key, ids in subscriptions.items() if ids}
+
+
+def sync_subscriptions(webhooks: Iterable[models.Model]) -> int:
+    """
+    Replace the subscription rows of `webhooks` with rows for their current `events` and owners.
+    Returns the number of rows created.
+    """
+    model = conf.WEBHOOK_SUBSCRIPTION_MODEL
+    owner_attname = conf.WEBHOOK_MODEL._meta.get_field(conf.OWNER_FIELD).attname
+    created = 0
+
+    for chunk in chunked(webhooks, conf.MAX_QUERY_PARAMS):
+        with transaction.atomic():
+            model.objects.filter(webhook_id__in=[webhook.pk for webhook in chunk]).delete()
+            rows = model.objects.bulk_create(
+                [
+                    model(webhook_id=webhook.pk, event=event, **{owner_attname: getattr(webhook, owner_attname)})
+                    for webhook in chunk
+                    for event in set(webhook.events)
+                ]
+            )
+        created += len(rows)
+
+    return created
+
+
+def _sync_subscriptions(sender, instance: models.Model, raw: bool = False, **kwargs):
+    if conf.SUBSCRIPTION_TABLE and not raw:
+        sync_subscriptions([instance])
+
+
+def _invalidate_subscription_cache(sender, instance: models.Model, using: str | None = None, **kwargs):
+    cache = get_subscription_cache()
+    if cache is not None:
+        owner_pk = getattr(instance, instance._meta.get_field(conf.OWNER_FIELD).attname)
+        cache.invalidate(owner_pk, str(instance.pk))
+        # Until the change is committed other connections still read the old rows and may cache them again
+        transaction.on_commit(partial(cache.invalidate, owner_pk, str(instance.pk)), using=using)
+
+
+def connect_signals():
+    """
+    Keeps the subscription table and cache in sync with `conf.WEBHOOK_MODEL`.
+    Called once from `AppConfig.ready()`.
+    """
+    # Deleted webhooks take their subscription rows with them (`on_delete=CASCADE`)
+    models.signals.post_save.connect(
+        _sync_subscriptions,
+        sender=conf.WEBHOOK_MODEL,
+        dispatch_uid='drf_webhooks.subscriptions._sync_subscriptions',
+    )
+    for signal in (models.signals.post_save, models.signals.post_delete):
+        signal.connect(
+            _invalidate_subscription_cache,
+            sender=conf.WEBHOOK_MODEL,
+            dispatch_uid='drf_webhooks.subscriptions._invalidate_subscription_cache',
+        )
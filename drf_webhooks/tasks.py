@@ -1,19 +1,24 @@
 import logging
 from contextlib import suppress
+from datetime import timedelta
 from typing import TYPE_CHECKING, Type
-from uuid import UUID, uuid4
+from urllib.parse import urlsplit
+from uuid import uuid4
 
 import httpx
 import pendulum
 import xmltodict
 from celery import shared_task
-from django.db import models
+from django.apps import apps
+from django.db import models, transaction
 from django.utils import timezone
 from pytimeparse.timeparse import timeparse
 from rest_framework import serializers
 from rest_framework.renderers import BaseRenderer
 
+from .client import get_http_client, get_timeout
 from .config import conf
+from .fingerprints import count_suppressed, is_unchanged, record_delivered
 from .serializers import WebhookEventSerializer
 from .utils import load_object_from_string
 
@@ -23,17 +28,23 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
-@shared_task
-def dispatch_webhook_event(
-    webhook_id: str,
+def _create_log_entry(
+    webhook: "AbstractWebhook",
     event: str,
     owner_id: int,
     object_id: str | None = None,
     data: None | dict = None,
     json_renderer_class: None | str = None,
     xml_renderer_class: None | str = None,
-):
-    webhook: Type[AbstractWebhook] = conf.WEBHOOK_MODEL.objects.get(id=webhook_id)  # type: ignore
+    pending: bool = False,
+    awaiting_batch: bool = False,
+) -> "AbstractWebhookLogEntry":
+    """
+    Render the request for a webhook event and store it as a log entry.
+    The log entry holds everything needed to send the request.
+
+    Events `awaiting_batch` are not rendered, they are sent as part of a batch's request.
+    """
     if data is None:
         data = {}
 
@@ -41,7 +52,7 @@ def dispatch_webhook_event(
     now = timezone.now()
     serializer = WebhookEventSerializer(
         data={
-            'webhook_id': UUID(webhook_id),
+            'webhook_id': webhook.pk,
             'event_id': event_id,
             'dt_dispatched': now,
             'owner_id': owner_id,
@@ -52,54 +63,97 @@ def dispatch_webhook_event(
     )
     serializer.is_valid(raise_exception=True)
 
-    content_type = webhook.target_content_type
-    content_type_renderer_map = {
-        'application/json': load_object_from_string(json_renderer_class or conf.DEFAULT_JSON_RENDERER_CLASS),
-        'application/xml': load_object_from_string(xml_renderer_class or conf.DEFAULT_XML_RENDERER_CLASS),
-    }
-
-    renderer: BaseRenderer = content_type_renderer_map[content_type]()
-    req_content = renderer.render(serializer.data)
-
-    headers = {
-        **webhook.target_headers,
-        'Content-Type': webhook.target_content_type,
-    }
-
-    log_entry: Type[AbstractWebhookLogEntry] = conf.WEBHOOK_LOG_ENTRY_MODEL.objects.create(  # type: ignore
+    return conf.WEBHOOK_LOG_ENTRY_MODEL.objects.create(  # type: ignore
         id=event_id,
-        webhook_id=webhook_id,
+        webhook_id=webhook.pk,
         owner_id=owner_id,  # FIXME: should be a configurable field name
         event=event,
         req_dt=now,
         req_url=webhook.target_url,
+        req_host=urlsplit(webhook.target_url).netloc,
         req_method=webhook.target_method,
-        req_headers=headers,
+        req_headers=_get_headers(webhook),
         req_data=serializer.data,
-        req_content=req_content,
+        req_content=(
+            '' if awaiting_batch else _render(webhook, serializer.data, json_renderer_class, xml_renderer_class)
+        ),
+        pending=pending,
+        awaiting_batch=awaiting_batch,
+    )
+
+
+def _create_batch_log_entry(
+    webhook: "AbstractWebhook",
+    log_entries: list["AbstractWebhookLogEntry"],
+    pending: bool = False,
+) -> "AbstractWebhookLogEntry":
+    """
+    Store the request sending `log_entries` as one list of event envelopes.
+    Rendered with the default renderers, as the events may come from several serializers.
+    """
+    data = [log_entry.req_data for log_entry in log_entries]
+
+    return conf.WEBHOOK_LOG_ENTRY_MODEL.objects.create(  # type: ignore
+        id=uuid4(),
+        webhook_id=webhook.pk,
+        owner_id=log_entries[0].owner_id,
+        event='batch',
+        req_dt=timezone.now(),
+        req_url=webhook.target_url,
+        req_host=urlsplit(webhook.target_url).netloc,
+        req_method=webhook.target_method,
+        req_headers=_get_headers(webhook),
+        req_data=data,
+        req_content=_render(webhook, data),
+        pending=pending,
     )
 
+
+def _get_headers(webhook: "AbstractWebhook") -> dict:
+    return {
+        **webhook.target_headers,
+        'Content-Type': webhook.target_content_type,
+    }
+
+
+def _render(
+    webhook: "AbstractWebhook",
+    data: dict | list,
+    json_renderer_class: None | str = None,
+    xml_renderer_class: None | str = None,
+) -> str:
+    content_type_renderer_map = {
+        'application/json': load_object_from_string(json_renderer_class or conf.DEFAULT_JSON_RENDERER_CLASS),
+        'application/xml': load_object_from_string(xml_renderer_class or conf.DEFAULT_XML_RENDERER_CLASS),
+    }
+
+    renderer: BaseRenderer = content_type_renderer_map[webhook.target_content_type]()
+    content = renderer.render(data)
+    if isinstance(content, bytes):
+        # Stored as text and sent from the log entry
+        content = content.decode(renderer.charset or 'utf-8')
+    return content
+
+
+def _record_error(log_entry: "AbstractWebhookLogEntry", error: httpx.HTTPError | httpx.InvalidURL):
+    # These exceptions happened before getting a response
+    log_entry.error_code = error.__class__.__name__
+    log_entry.error_message = str(error)
+    log_entry.claimed_dt = None
+    log_entry.save(update_fields=['error_code', 'error_message', 'claimed_dt'])
+
+
+def _record_response(log_entry: "AbstractWebhookLogEntry", res: httpx.Response):
     try:
-        res = getattr(httpx, webhook.target_method)(
-            url=webhook.target_url,
-            headers=headers,
-            content=req_content,
-        )
         res.raise_for_status()
-
     except httpx.HTTPStatusError as e:
         # The only exception that has a response
         log_entry.error_code = "HTTPStatusError"
         log_entry.error_message = str(e)
-        res: httpx.Response = e.response
-
-    except (httpx.HTTPError, httpx.InvalidURL) as e:
-        # These exceptions happened before getting a response
-        log_entry.error_code = e.__class__.__name__
-        log_entry.error_message = str(e)
-        log_entry.save(update_fields=['error_code', 'error_message'])
-        return
+    else:
+        record_delivered(log_entry)
 
+    log_entry.claimed_dt = None
     log_entry.res_dt = timezone.now()
     log_entry.res_status = res.status_code
     log_entry.res_headers = dict(res.headers.items())
@@ -108,16 +162,163 @@ def dispatch_webhook_event(
     res_content_type = res.headers.get("Content-Type", "")
     if 'application/json' in res_content_type:
         with suppress(ValueError):
-            log_entry.data = res.json()
+            log_entry.res_data = res.json()
 
     elif 'application/xml' in res_content_type or 'text/xml' in res_content_type:
         with suppress(Exception):
-            log_entry.data = xmltodict.parse(res.text)
+            log_entry.res_data = xmltodict.parse(res.text)
 
     log_entry.save()
+
+
+@shared_task
+def dispatch_webhook_event(
+    webhook_id: str,
+    event: str,
+    owner_id: int,
+    object_id: str | None = None,
+    data: None | dict = None,
+    json_renderer_class: None | str = None,
+    xml_renderer_class: None | str = None,
+):
+    webhook: AbstractWebhook = conf.WEBHOOK_MODEL.objects.get(id=webhook_id)  # type: ignore
+    return _send_webhook_event(webhook, event, owner_id, object_id, data, json_renderer_class, xml_renderer_class)
+
+
+def _send_webhook_event(
+    webhook: "AbstractWebhook",
+    event: str,
+    owner_id: int,
+    object_id: str | None = None,
+    data: None | dict = None,
+    json_renderer_class: None | str = None,
+    xml_renderer_class: None | str = None,
+):
+    if event.endswith('.updated') and data is not None and is_unchanged(webhook.pk, object_id, data):
+        # Nothing the serializer exposes has changed since the last delivery
+        logger.debug(f"Suppressed {event} for {object_id} to webhook {webhook.pk}, the payload is unchanged")
+        count_suppressed()
+        return
+
+    if webhook.max_batch_size:
+        _create_log_entry(
+            webhook,
+            event,
+            owner_id,
+            object_id,
+            data,
+            json_renderer_class,
+            xml_renderer_class,
+            awaiting_batch=True,
+        )
+        # Partial batches are sent by `send_webhook_batches` after `max_batch_wait`
+        _send_webhook_batches(webhook, full_only=True)
+        return
+
+    if conf.DELIVERY_BACKEND == 'asyncio':
+        # Sent by the `deliver_webhooks` management command
+        _create_log_entry(webhook, event, owner_id, object_id, data, json_renderer_class, xml_renderer_class, True)
+        return
+
+    log_entry = _create_log_entry(webhook, event, owner_id, object_id, data, json_renderer_class, xml_renderer_class)
+    return _send_log_entry(webhook, log_entry)
+
+
+def _send_log_entry(webhook: "AbstractWebhook", log_entry: "AbstractWebhookLogEntry"):
+    try:
+        res = get_http_client().request(
+            log_entry.req_method.upper(),
+            url=log_entry.req_url,
+            headers=log_entry.req_headers,
+            content=log_entry.req_content,
+            timeout=get_timeout(webhook),
+        )
+    except (httpx.HTTPError, httpx.InvalidURL) as e:
+        _record_error(log_entry, e)
+        return
+
+    _record_response(log_entry, res)
     return res
 
 
+def _send_webhook_batches(webhook: "AbstractWebhook", full_only: bool = False) -> int:
+    """
+    Send the events of `webhook` that are awaiting a batch, up to `max_batch_size` per request.
+    With `full_only`, a remaining partial batch is left waiting. Returns the number of sent batches.
+
+    Events locked by a concurrent sender are skipped, so each event is sent in one batch only.
+    """
+    model = conf.WEBHOOK_LOG_ENTRY_MODEL
+    size = webhook.max_batch_size or None
+    sent = 0
+
+    while True:
+        with transaction.atomic():
+            log_entries = list(
+                model.objects.select_for_update(skip_locked=True)
+                .filter(webhook=webhook, awaiting_batch=True)
+                .order_by('req_dt')[:size]
+            )
+            if not log_entries or (full_only and len(log_entries) < (size or 0)):
+                return sent
+
+            pending = conf.DELIVERY_BACKEND == 'asyncio'
+            batch = _create_batch_log_entry(webhook, log_entries, pending)
+            model.objects.filter(pk__in=[e.pk for e in log_entries]).update(awaiting_batch=False, batch=batch)
+
+        if not pending:
+            _send_log_entry(webhook, batch)
+        sent += 1
+
+        if size is None:
+            return sent
+
+
+def queue_webhook_event(*args):
+    """
+    Queue a `dispatch_webhook_event`.
+    With the asyncio delivery backend the request is only rendered and stored, so it is done in place.
+    """
+    if conf.DELIVERY_BACKEND == 'asyncio':
+        return dispatch_webhook_event(*args)
+    return dispatch_webhook_event.apply_async(args=args)
+
+
+def _serialize_instance(serializer_class_module: str, instance_id: int | str) -> dict | None:
+    """
+    Load and serialize an instance. Returns `None` if the instance no longer exists.
+    """
+    from .main import get_serializer_queryset  # main imports this module
+
+    serializer_class: Type[serializers.ModelSerializer] = load_object_from_string(serializer_class_module)
+
+    model_class: Type[models.Model] = serializer_class.Meta.model
+    try:
+        instance = get_serializer_queryset(serializer_class).get(pk=instance_id)
+    except model_class.DoesNotExist:
+        logger.warning(
+            f"Webhook task for {model_class.__name__}(pk={instance_id}) failed. Instance no longer exists in database"
+        )
+        return None
+
+    return serializer_class(instance=instance).data
+
+
+def _serialize_instances(serializer_class_module: str, instance_ids: list[int | str]) -> dict[str, dict]:
+    """
+    Serialize many instances of one serializer in a single queryset pass, sharing prefetches.
+    Returns the data by `str(pk)`, instances that no longer exist are left out.
+    """
+    from .main import get_serializer_queryset  # main imports this module
+
+    serializer_class: Type[serializers.ModelSerializer] = load_object_from_string(serializer_class_module)
+    queryset = get_serializer_queryset(serializer_class).filter(pk__in=instance_ids)
+    return {
+        str(instance.pk): serializer_class(instance=instance).data
+        for instance in queryset.iterator(chunk_size=conf.BULK_DISPATCH_SIZE)
+    }
+
+
 @shared_task
 def dispatch_serializer_webhook_event(
     webhook_id: str,
@@ -131,17 +332,10 @@ def dispatch_serializer_webhook_event(
     data = None
 
     if serializer_class_module:
-        serializer_class: Type[serializers.ModelSerializer] = load_object_from_string(serializer_class_module)
-
-        model_class: Type[models.Model] = serializer_class.Meta.model
-        try:
-            instance = model_class.objects.get(pk=instance_id)
-        except model_class.DoesNotExist:
-            logger.warning(f"Webhook task for {repr(instance)} failed. Instance no longer exists in database")
+        data = _serialize_instance(serializer_class_module, instance_id)
+        if data is None:
             return
 
-        data = serializer_class(instance=instance).data
-
     return dispatch_webhook_event(
         webhook_id,
         event,
@@ -153,6 +347,182 @@ def dispatch_serializer_webhook_event(
     )
 
 
+@shared_task
+def dispatch_serializer_webhook_events(
+    webhook_ids: list[str],
+    event: str,
+    owner_id: int,
+    instance_id: int | str,
+    serializer_class_module: str | None,
+    json_renderer_class: None | str = None,
+    xml_renderer_class: None | str = None,
+):
+    """
+    Serialize the instance once and queue a separate delivery for each webhook,
+    so a slow endpoint does not delay the others.
+    """
+    data = None
+
+    if serializer_class_module:
+        data = _serialize_instance(serializer_class_module, instance_id)
+        if data is None:
+            return
+
+    for webhook_id in webhook_ids:
+        queue_webhook_event(
+            webhook_id,
+            event,
+            owner_id,
+            str(instance_id),
+            data,
+            json_renderer_class,
+            xml_renderer_class,
+        )
+
+
+@shared_task
+def dispatch_serializer_webhook_events_bulk(
+    event: str,
+    items: list[tuple[str, int, list[str]]],
+    serializer_class_module: str | None,
+    json_renderer_class: None | str = None,
+    xml_renderer_class: None | str = None,
+):
+    """
+    Serialize many instances of one model in a single queryset pass, sharing prefetches,
+    and queue a separate delivery for each (instance, webhook).
+
+    `items` is a list of `(instance_id, owner_id, webhook_ids)`
+    """
+    data_by_id: dict[str, dict] = {}
+
+    if serializer_class_module:
+        data_by_id = _serialize_instances(serializer_class_module, [instance_id for instance_id, _, _ in items])
+
+    for instance_id, owner_id, webhook_ids in items:
+        data = None
+        if serializer_class_module:
+            try:
+                data = data_by_id[str(instance_id)]
+            except KeyError:
+                logger.warning(
+                    f"Webhook task for {serializer_class_module}(pk={instance_id}) failed. "
+                    "Instance no longer exists in database"
+                )
+                continue
+
+        for webhook_id in webhook_ids:
+            queue_webhook_event(
+                webhook_id,
+                event,
+                owner_id,
+                str(instance_id),
+                data,
+                json_renderer_class,
+                xml_renderer_class,
+            )
+
+
+@shared_task
+def dispatch_session_batch(
+    items: list[tuple[str, int, str, list[str], str | None, str | None, str | None]],
+):
+    """
+    Serialize and send the events of a session from a single task.
+    Instances of the same serializer are serialized in one queryset pass, and the webhooks are loaded at once.
+
+    `items` is a list of
+    `(event, owner_id, instance_id, webhook_ids, serializer_class_module, json_renderer_class, xml_renderer_class)`
+    """
+    instance_ids: dict[str, list[str]] = {}
+    for _, _, instance_id, _, serializer_class_module, _, _ in items:
+        if serializer_class_module:
+            instance_ids.setdefault(serializer_class_module, []).append(instance_id)
+
+    data_by_module = {module: _serialize_instances(module, ids) for module, ids in instance_ids.items()}
+    webhooks = {
+        str(pk): webhook
+        for pk, webhook in conf.WEBHOOK_MODEL.objects.in_bulk(
+            {webhook_id for _, _, _, webhook_ids, _, _, _ in items for webhook_id in webhook_ids}
+        ).items()
+    }
+
+    for event, owner_id, instance_id, webhook_ids, serializer_class_module, json_r, xml_r in items:
+        data = None
+        if serializer_class_module:
+            try:
+                data = data_by_module[serializer_class_module][str(instance_id)]
+            except KeyError:
+                logger.warning(
+                    f"Webhook task for {serializer_class_module}(pk={instance_id}) failed. "
+                    "Instance no longer exists in database"
+                )
+                continue
+
+        for webhook_id in webhook_ids:
+            try:
+                webhook = webhooks[str(webhook_id)]
+            except KeyError:
+                logger.warning(f"Webhook {webhook_id} for {event} no longer exists in database")
+                continue
+
+            _send_webhook_event(webhook, event, owner_id, str(instance_id), data, json_r, xml_r)
+
+
+@shared_task
+def dispatch_nested_changes(
+    serializer_class_module: str,
+    nested_pks: dict[str, list],
+    exclude_pks: list,
+):
+    """
+    Dispatch `updated` events for the base instances of a webhook that reference changed nested instances,
+    streaming their primary keys instead of loading them at once. Queued by a session when they are more than
+    the webhook's `max_fan_out`.
+
+    `nested_pks` are the primary keys of changed nested instances by model label,
+    `exclude_pks` the base instances the session dispatched itself.
+    """
+    from .main import _STORE  # main imports this module
+
+    serializer_class = load_object_from_string(serializer_class_module)
+    try:
+        msw = _STORE["model_serializer_webhook_instances"][serializer_class]
+    except KeyError:
+        logger.warning(f"Nested changes for {serializer_class_module} dropped. No webhook is registered for it")
+        return
+
+    return msw._dispatch_nested_changes({apps.get_model(label): pks for label, pks in nested_pks.items()}, exclude_pks)
+
+
+@shared_task
+def send_webhook_batches():
+    """
+    Send the batches that waited for `max_batch_wait` without filling up.
+    Should run at least as often as the shortest `max_batch_wait`.
+    """
+    now = timezone.now()
+    webhooks = conf.WEBHOOK_MODEL.objects.filter(log_entries__awaiting_batch=True).annotate(
+        oldest_dt=models.Min('log_entries__req_dt', filter=models.Q(log_entries__awaiting_batch=True))
+    )
+    for webhook in webhooks:
+        wait = timedelta(seconds=webhook.max_batch_wait or conf.BATCH_MAX_WAIT)
+        if not webhook.max_batch_size or webhook.oldest_dt <= now - wait:
+            _send_webhook_batches(webhook)
+
+
+@shared_task
+def relay_webhook_outbox():
+    """
+    Queue everything in the outbox, in batches of `conf.OUTBOX_BATCH_SIZE`
+    """
+    # outbox imports main, which imports this module
+    from .outbox import relay_outbox
+
+    while relay_outbox() == conf.OUTBOX_BATCH_SIZE:
+        pass
+
+
 @shared_task
 def auto_clean_log():
     log_retention = timeparse(conf.LOG_RETENTION, "minutes")
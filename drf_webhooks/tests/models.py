@@ -40,3 +40,8 @@ class Many(models.Model):
 
     def __str__(self) -> str:
         return f"Many(id={self.pk}, name={self.name})"
+
+
+class LevelThreeProxy(LevelThree):
+    class Meta:
+        proxy = True
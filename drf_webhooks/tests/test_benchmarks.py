@@ -0,0 +1,154 @@
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import httpx
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import models
+
+from .. import client, main
+from ..main import ModelSerializerWebhook, register_webhook, unregister_webhook
+from ..sessions import webhook_signal_session
+from .models import LevelOne, LevelThree, LevelTwo
+from .serializers import LevelTwoSerializer
+
+User = get_user_model()
+
+pytestmark = pytest.mark.benchmark
+
+
+def _timed_batches(fn, batches: int, batch_size: int) -> list[float]:
+    timings = []
+    for _ in range(batches):
+        start = time.perf_counter()
+        for _ in range(batch_size):
+            fn()
+        timings.append((time.perf_counter() - start) / batch_size)
+    return timings
+
+
+def test_per_save_overhead_is_constant():
+    """
+    100k request-like sessions with one save each.
+    The cost of a save must not grow with the number of sessions that came before it.
+    """
+    instance = User(pk=1)
+    receivers = len(models.signals.post_save.receivers)
+
+    def request():
+        with webhook_signal_session():
+            models.signals.post_save.send(User, instance=instance, created=False)
+
+    timings = _timed_batches(request, batches=100, batch_size=1000)
+
+    first = statistics.median(timings[:10])
+    last = statistics.median(timings[-10:])
+    print(f"\nper request: first 10k={first * 1e6:.2f}us, last 10k={last * 1e6:.2f}us")
+
+    assert len(models.signals.post_save.receivers) == receivers
+    assert last < first * 2
+
+
+class LevelTwoBenchWebhook(ModelSerializerWebhook):
+    def get_owner(self, instance):
+        return instance.parent.owner  # type: ignore
+
+
+@contextmanager
+def _registered_webhooks(count: int):
+    serializer_classes = [type(f"Bench{i}LevelTwoSerializer", (LevelTwoSerializer,), {}) for i in range(count)]
+    for i, serializer_class in enumerate(serializer_classes):
+        register_webhook(serializer_class)(
+            type(f"Bench{i}Webhook", (LevelTwoBenchWebhook,), {"base_name": f"bench.{i}"})
+        )
+    try:
+        yield
+    finally:
+        for serializer_class in serializer_classes:
+            unregister_webhook(serializer_class)
+
+
+def test_per_request_overhead_with_100_webhooks(db):
+    owner = User.objects.create()
+    two = LevelTwo.objects.create(name="two", parent=LevelOne.objects.create(name="one", owner=owner))
+    three = LevelThree.objects.create(name="three", parent=two)
+
+    def request_without_signals():
+        with webhook_signal_session():
+            pass
+
+    def request_with_signal():
+        with webhook_signal_session():
+            models.signals.post_save.send(LevelThree, instance=three, created=False)
+
+    with _registered_webhooks(100), mock.patch.object(
+        main,
+        "get_serializer_query_names",
+        wraps=main.get_serializer_query_names,
+    ) as get_serializer_query_names:
+        empty = statistics.median(_timed_batches(request_without_signals, batches=10, batch_size=1000))
+        one = statistics.median(_timed_batches(request_with_signal, batches=3, batch_size=5))
+
+    print(f"\nper request (100 webhooks): 0 signals={empty * 1e6:.2f}us, 1 signal={one * 1e3:.2f}ms")
+
+    # Serializer trees are only walked at registration
+    assert get_serializer_query_names.call_count == 0
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.connections.add(self.client_address)  # type: ignore
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def _stand_in_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    server.connections = set()  # type: ignore
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_pooled_http_client():
+    # Requests are sent without body, on loopback a separate body write waits for a delayed ACK
+    # and adds the same ~40ms to both clients
+    requests = 50
+
+    with _stand_in_server() as server:
+        url = f"http://127.0.0.1:{server.server_port}/"
+
+        start = time.perf_counter()
+        for _ in range(requests):
+            httpx.post(url)
+        fresh = (time.perf_counter() - start) / requests
+        fresh_connections = len(server.connections)
+
+        server.connections.clear()  # type: ignore
+        http_client = client.get_http_client()
+        start = time.perf_counter()
+        for _ in range(requests):
+            http_client.post(url)
+        pooled = (time.perf_counter() - start) / requests
+        pooled_connections = len(server.connections)
+
+    print(f"\nper delivery: fresh client={fresh * 1e3:.2f}ms, pooled client={pooled * 1e3:.2f}ms")
+
+    assert fresh_connections == requests
+    assert pooled_connections == 1
@@ -0,0 +1,34 @@
+import os
+
+from .. import client
+from ..config import conf
+
+Webhook = conf.WEBHOOK_MODEL
+
+
+def test_http_client_is_reused():
+    assert client.get_http_client() is client.get_http_client()
+
+
+def test_http_client_recreated_after_fork(monkeypatch):
+    # The module level client is restored afterwards
+    monkeypatch.setattr(client, '_client', None)
+    monkeypatch.setattr(client, '_client_pid', None)
+    parent_client = client.get_http_client()
+
+    pid = os.getpid()
+    monkeypatch.setattr(client.os, 'getpid', lambda: pid + 1)
+    child_client = client.get_http_client()
+
+    try:
+        assert child_client is not parent_client
+        assert not parent_client.is_closed
+    finally:
+        parent_client.close()
+        child_client.close()
+
+
+def test_timeout():
+    timeout = client.get_timeout(Webhook(connect_timeout=1.5))
+    assert timeout.connect == 1.5
+    assert timeout.read == conf.HTTP_READ_TIMEOUT
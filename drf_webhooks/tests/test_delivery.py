@@ -0,0 +1,131 @@
+import json
+from datetime import timedelta
+
+import httpx
+import pytest
+import xmltodict
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+
+from ..config import REGISTERED_WEBHOOK_CHOICES, conf
+from ..delivery import claim_pending_log_entries, requeue_stale_log_entries
+from ..tasks import dispatch_webhook_event, send_webhook_batches
+
+Webhook = conf.WEBHOOK_MODEL
+WebhookLogEntry = conf.WEBHOOK_LOG_ENTRY_MODEL
+
+
+@pytest.fixture
+def asyncio_backend(monkeypatch):
+    monkeypatch.setattr(conf, 'DELIVERY_BACKEND', 'asyncio')
+    monkeypatch.setitem(REGISTERED_WEBHOOK_CHOICES, 'test.event', "Test Event")
+
+
+def test_asyncio_delivery(transactional_db, httpx_mock, asyncio_backend):
+    owner = get_user_model().objects.create()
+    webhooks = [
+        Webhook.objects.create(owner=owner, events=['test.event'], target_url=f"http://reon.mock/{i}/")
+        for i in range(3)
+    ]
+    httpx_mock.add_callback(lambda request: httpx.Response(200, json={'ok': True}))
+
+    for webhook in webhooks:
+        for i in range(5):
+            dispatch_webhook_event(str(webhook.pk), 'test.event', owner.pk, str(i), {'i': i})
+
+    # Requests are only rendered and stored
+    assert not httpx_mock.get_requests()
+    assert WebhookLogEntry.objects.filter(pending=True).count() == 15
+
+    call_command('deliver_webhooks', '--once', '--concurrency=4', '--per-host=2')
+
+    assert len(httpx_mock.get_requests()) == 15
+    assert sorted(json.loads(r.content)['payload']['i'] for r in httpx_mock.get_requests()) == sorted(
+        list(range(5)) * 3
+    )
+    assert not WebhookLogEntry.objects.filter(pending=True).exists()
+    for values in WebhookLogEntry.objects.values_list('res_status', 'res_data', 'claimed_dt'):
+        assert values == (200, {'ok': True}, None)
+
+
+def test_claim_respects_per_host_limit(db, asyncio_backend):
+    owner = get_user_model().objects.create()
+    slow = Webhook.objects.create(owner=owner, events=['test.event'], target_url="http://slow.mock/")
+    fast = Webhook.objects.create(owner=owner, events=['test.event'], target_url="http://fast.mock/")
+
+    # The backlog of the slow host is older than the requests to the fast host
+    for i in range(10):
+        dispatch_webhook_event(str(slow.pk), 'test.event', owner.pk, str(i), {'i': i})
+    for i in range(2):
+        dispatch_webhook_event(str(fast.pk), 'test.event', owner.pk, str(i), {'i': i})
+
+    claimed = claim_pending_log_entries(10, per_host=3)
+    assert [e.req_host for e in claimed] == ['slow.mock'] * 3
+    assert all(e.claimed_dt is not None and not e.pending for e in claimed)
+
+    # While the slow host is saturated its backlog is skipped
+    claimed = claim_pending_log_entries(10, per_host=3, in_flight={'slow.mock': 3})
+    assert [e.req_host for e in claimed] == ['fast.mock'] * 2
+
+    assert len(claim_pending_log_entries(10, per_host=3, in_flight={'slow.mock': 2})) == 1
+    assert WebhookLogEntry.objects.filter(pending=True).count() == 6
+
+
+def test_requeue_stale_claims(db, asyncio_backend):
+    owner = get_user_model().objects.create()
+    webhook = Webhook.objects.create(owner=owner, events=['test.event'], target_url="http://reon.mock/")
+    dispatch_webhook_event(str(webhook.pk), 'test.event', owner.pk, '1', {})
+
+    [log_entry] = claim_pending_log_entries(10, per_host=3)
+    assert requeue_stale_log_entries(timedelta(minutes=5)) == 0
+
+    # The engine sending it died
+    WebhookLogEntry.objects.filter(pk=log_entry.pk).update(claimed_dt=timezone.now() - timedelta(minutes=10))
+    assert requeue_stale_log_entries(timedelta(minutes=5)) == 1
+
+    log_entry.refresh_from_db()
+    assert log_entry.pending and log_entry.claimed_dt is None
+
+
+@pytest.mark.parametrize('content_type', ['application/json', 'application/xml'])
+def test_batched_delivery(db, httpx_mock, monkeypatch, content_type):
+    monkeypatch.setitem(REGISTERED_WEBHOOK_CHOICES, 'test.event', "Test Event")
+    owner = get_user_model().objects.create()
+    webhook = Webhook.objects.create(
+        owner=owner,
+        events=['test.event'],
+        target_url="http://reon.mock/",
+        target_content_type=content_type,
+        max_batch_size=2,
+        max_batch_wait=60,
+    )
+    httpx_mock.add_response()
+
+    for i in range(3):
+        dispatch_webhook_event(str(webhook.pk), 'test.event', owner.pk, str(i), {'i': i})
+
+    # The first batch is full, the last event waits
+    assert len(httpx_mock.get_requests()) == 1
+    send_webhook_batches()
+    assert len(httpx_mock.get_requests()) == 1
+
+    WebhookLogEntry.objects.filter(awaiting_batch=True).update(req_dt=timezone.now() - timedelta(minutes=1))
+    send_webhook_batches()
+
+    bodies = []
+    for request in httpx_mock.get_requests():
+        if content_type == 'application/json':
+            bodies.append([envelope['objectId'] for envelope in json.loads(request.content)])
+        else:
+            items = xmltodict.parse(request.content)['root']['list-item']
+            bodies.append([item['object_id'] for item in (items if isinstance(items, list) else [items])])
+    assert bodies == [['0', '1'], ['2']]
+
+    batches = WebhookLogEntry.objects.filter(event='batch').order_by('req_dt')
+    assert [sorted([e.req_data['object_id'] for e in batch.batch_entries.all()]) for batch in batches] == [
+        ['0', '1'],
+        ['2'],
+    ]
+    assert all(batch.res_status == 200 for batch in batches)
+    assert not WebhookLogEntry.objects.filter(awaiting_batch=True).exists()
@@ -0,0 +1,61 @@
+import pytest
+from django.contrib.auth import get_user_model
+
+from ..api import WebhookSerializer
+from ..config import REGISTERED_WEBHOOK_CHOICES, conf
+from ..events import get_candidate_patterns, get_matcher
+from ..subscriptions import get_subscribed_webhook_ids
+
+Webhook = conf.WEBHOOK_MODEL
+
+
+@pytest.fixture
+def registered_events(monkeypatch):
+    for event in ('inventory.item.created', 'inventory.item.deleted', 'orders.deleted'):
+        monkeypatch.setitem(REGISTERED_WEBHOOK_CHOICES, event, event)
+
+
+@pytest.mark.parametrize(
+    'pattern,event,matches',
+    [
+        ('inventory.item.created', 'inventory.item.created', True),
+        ('inventory.*', 'inventory.item.created', True),
+        ('inventory.*.deleted', 'inventory.item.deleted', True),
+        ('inventory.*.deleted', 'inventory.item.created', False),
+        ('*.deleted', 'orders.deleted', True),
+        ('*.deleted', 'inventory.item.deleted', False),
+        ('orders.*', 'orders', False),
+        ('*', 'orders.deleted', True),
+    ],
+)
+def test_matcher(pattern, event, matches):
+    assert get_matcher([pattern]).matches(event) is matches
+    assert (pattern in get_candidate_patterns(event)) is matches
+
+
+@pytest.mark.parametrize('subscription_table', [False, True])
+def test_wildcard_subscriptions(db, monkeypatch, subscription_table):
+    monkeypatch.setattr(conf, 'SUBSCRIPTION_TABLE', subscription_table)
+    owner = get_user_model().objects.create()
+    inventory = Webhook.objects.create(
+        owner=owner, events=['inventory.*', 'inventory.item.created'], target_url="http://reon.mock/"
+    )
+    deletes = Webhook.objects.create(owner=owner, events=['*.deleted'], target_url="http://reon.mock/")
+
+    assert get_subscribed_webhook_ids(
+        [(owner.pk, 'inventory.item.created'), (owner.pk, 'orders.deleted'), (owner.pk, 'orders.created')]
+    ) == {
+        (owner.pk, 'inventory.item.created'): (str(inventory.pk),),
+        (owner.pk, 'orders.deleted'): (str(deletes.pk),),
+    }
+
+
+def test_serializer_validates_patterns(registered_events):
+    def errors(events):
+        serializer = WebhookSerializer(data={'events': events, 'target_url': "http://reon.mock/"})
+        serializer.is_valid()
+        return serializer.errors.get('events')
+
+    assert not errors(['inventory.item.created', 'inventory.*', '*.deleted'])
+    assert errors(['inventory.item.updated'])
+    assert errors(['invntory.*'])
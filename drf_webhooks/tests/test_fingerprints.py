@@ -0,0 +1,42 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+
+from ..config import REGISTERED_WEBHOOK_CHOICES, conf
+from ..fingerprints import get_fingerprint, get_suppressed_count
+from ..tasks import dispatch_webhook_event
+
+Webhook = conf.WEBHOOK_MODEL
+
+
+@pytest.fixture
+def fingerprints(monkeypatch):
+    monkeypatch.setattr(conf, 'PAYLOAD_FINGERPRINTS', 'default')
+    monkeypatch.setitem(REGISTERED_WEBHOOK_CHOICES, 'test.updated', "Test Updated")
+    caches['default'].clear()
+
+
+def test_fingerprint_is_stable():
+    assert get_fingerprint({'a': 1, 'b': [1, 2]}) == get_fingerprint({'b': [1, 2], 'a': 1})
+    assert get_fingerprint({'a': 1}) != get_fingerprint({'a': 2})
+
+
+def test_unchanged_updates_are_suppressed(db, httpx_mock, fingerprints):
+    owner = get_user_model().objects.create()
+    webhook = Webhook.objects.create(owner=owner, events=['test.updated'], target_url="http://reon.mock/")
+    httpx_mock.add_response(status_code=500)
+
+    # Failed deliveries are not remembered
+    dispatch_webhook_event(str(webhook.pk), 'test.updated', owner.pk, '1', {'name': "one"})
+    httpx_mock.add_response()
+    dispatch_webhook_event(str(webhook.pk), 'test.updated', owner.pk, '1', {'name': "one"})
+    assert len(httpx_mock.get_requests()) == 2
+
+    dispatch_webhook_event(str(webhook.pk), 'test.updated', owner.pk, '1', {'name': "one"})
+    assert len(httpx_mock.get_requests()) == 2
+    assert get_suppressed_count() == 1
+
+    dispatch_webhook_event(str(webhook.pk), 'test.updated', owner.pk, '1', {'name': "one!"})
+    dispatch_webhook_event(str(webhook.pk), 'test.updated', owner.pk, '2', {'name': "one!"})
+    assert len(httpx_mock.get_requests()) == 4
+    assert get_suppressed_count() == 1
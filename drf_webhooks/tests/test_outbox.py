@@ -0,0 +1,82 @@
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from .. import tasks
+from ..config import conf
+from ..main import register_webhook, unregister_webhook
+from ..outbox import relay_outbox
+from ..sessions import webhook_signal_session
+from .models import LevelOne
+from .serializers import LevelOneSerializer
+
+Webhook = conf.WEBHOOK_MODEL
+WebhookOutboxEvent = conf.WEBHOOK_OUTBOX_MODEL
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    monkeypatch.setattr(conf, 'OUTBOX', True)
+    register_webhook(LevelOneSerializer)()
+    yield
+    unregister_webhook(LevelOneSerializer)
+
+
+def test_outbox(db, outbox):
+    owner = get_user_model().objects.create()
+    webhooks = [
+        Webhook.objects.create(owner=owner, events=['level_one.created'], target_url=f"http://reon.mock/{i}/")
+        for i in range(2)
+    ]
+
+    with mock.patch.object(tasks.dispatch_serializer_webhook_event, 'apply_async') as apply_async:
+        with CaptureQueriesContext(connection) as ctx:
+            with webhook_signal_session():
+                ones = [LevelOne.objects.create(name=f"one{i}", owner=owner) for i in range(3)]
+
+        assert not apply_async.called
+        assert len([q for q in ctx.captured_queries if 'webhookoutboxevent' in q['sql']]) == 1
+        assert WebhookOutboxEvent.objects.count() == 3
+
+        assert relay_outbox(batch_size=2) == 2
+        assert relay_outbox(batch_size=2) == 1
+        assert relay_outbox(batch_size=2) == 0
+
+    assert not WebhookOutboxEvent.objects.exists()
+    assert sorted((call.kwargs['args'][0], call.kwargs['args'][3]) for call in apply_async.call_args_list) == sorted(
+        (str(webhook.pk), str(one.pk)) for webhook in webhooks for one in ones
+    )
+
+
+def test_outbox_rolled_back(db, outbox):
+    owner = get_user_model().objects.create()
+    Webhook.objects.create(owner=owner, events=['level_one.created'], target_url="http://reon.mock/")
+
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            with webhook_signal_session():
+                LevelOne.objects.create(name="one", owner=owner)
+            raise RuntimeError
+
+    assert not WebhookOutboxEvent.objects.exists()
+
+
+def test_outbox_session_outside_transaction(db, outbox):
+    owner = get_user_model().objects.create()
+    Webhook.objects.create(owner=owner, events=['level_one.created'], target_url="http://reon.mock/")
+
+    # Like `WebhooksMiddleware` around `ATOMIC_REQUESTS`
+    with webhook_signal_session():
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                LevelOne.objects.create(name="rolled back", owner=owner)
+                raise RuntimeError
+
+        with transaction.atomic():
+            with transaction.atomic():
+                one = LevelOne.objects.create(name="one", owner=owner)
+
+    assert list(WebhookOutboxEvent.objects.values_list('object_id', flat=True)) == [str(one.pk)]
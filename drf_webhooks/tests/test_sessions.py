@@ -0,0 +1,306 @@
+import asyncio
+import threading
+from contextlib import nullcontext
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from rest_framework import serializers
+
+from ..config import conf
+from ..main import register_webhook, unregister_webhook
+from ..sessions import (
+    SignalBuffer,
+    WebhookSignalSession,
+    _post_init,
+    connect_signals,
+    get_current_session,
+    webhook_signal_session,
+)
+from .models import LevelOne, Many
+from .serializers import LevelOneSerializer
+
+User = get_user_model()
+
+
+def test_receivers_connected_once():
+    receivers = len(models.signals.post_save.receivers)
+
+    for _ in range(100):
+        with webhook_signal_session():
+            pass
+
+    assert len(models.signals.post_save.receivers) == receivers
+
+
+def test_signals_outside_session_are_ignored():
+    assert get_current_session() is None
+    models.signals.post_save.send(User, instance=User(pk=1), created=True)
+
+
+class UserIdSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('id',)
+
+
+@pytest.fixture
+def flushed():
+    pks: list = []
+
+    def flush(session):
+        pks.extend(s.pk for s in session._signals)
+        session._signals.clear()
+
+    # Signals are only collected for models a webhook serializes
+    register_webhook(UserIdSerializer)()
+    with mock.patch.object(WebhookSignalSession, 'flush', autospec=True, side_effect=flush):
+        yield pks
+    unregister_webhook(UserIdSerializer)
+
+
+def test_nested_sessions(flushed):
+    with webhook_signal_session() as outer:
+        models.signals.post_save.send(User, instance=User(pk=1), created=True)
+
+        with webhook_signal_session() as inner:
+            assert get_current_session() is inner
+            models.signals.post_save.send(User, instance=User(pk=2), created=True)
+            assert [s.pk for s in inner._signals] == [2]
+
+        assert get_current_session() is outer
+        assert [s.pk for s in outer._signals] == [1, 2]
+
+    assert get_current_session() is None
+
+
+def test_sessions_are_isolated_between_threads(flushed):
+    barrier = threading.Barrier(2)
+    sessions: dict[int, WebhookSignalSession] = {}
+
+    def worker(pk: int):
+        with webhook_signal_session() as session:
+            sessions[pk] = session
+            barrier.wait()
+            models.signals.post_save.send(User, instance=User(pk=pk), created=True)
+            barrier.wait()
+            assert [s.pk for s in session._signals] == [pk]
+
+    threads = [threading.Thread(target=worker, args=(pk,)) for pk in (1, 2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(sessions) == 2
+
+
+def test_sessions_are_isolated_between_tasks(flushed):
+    async def worker(pk: int):
+        with webhook_signal_session() as session:
+            await asyncio.sleep(0)
+            models.signals.post_save.send(User, instance=User(pk=pk), created=True)
+            await asyncio.sleep(0)
+            return [s.pk for s in session._signals]
+
+    async def main():
+        return await asyncio.gather(worker(1), worker(2))
+
+    assert asyncio.run(main()) == [[1], [2]]
+
+
+def test_flushed_after_commit(db, django_capture_on_commit_callbacks, flushed):
+    with django_capture_on_commit_callbacks(execute=True):
+        with transaction.atomic():
+            with webhook_signal_session():
+                user = User.objects.create(username="one")
+            assert flushed == []
+
+    assert flushed == [user.pk]
+
+
+def test_rolled_back_savepoints_are_dropped(db, django_capture_on_commit_callbacks, flushed):
+    with django_capture_on_commit_callbacks(execute=True):
+        with webhook_signal_session():
+            with transaction.atomic():
+                one = User.objects.create(username="one")
+                try:
+                    with transaction.atomic():
+                        User.objects.create(username="two")
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                three = User.objects.create(username="three")
+
+            with pytest.raises(RuntimeError):
+                with transaction.atomic():
+                    User.objects.create(username="four")
+                    raise RuntimeError
+
+    assert flushed == [one.pk, three.pk]
+
+
+def test_nested_session_closed_inside_transaction(db, django_capture_on_commit_callbacks, flushed):
+    with django_capture_on_commit_callbacks(execute=True):
+        with webhook_signal_session():
+            with transaction.atomic():
+                with webhook_signal_session():
+                    one = User.objects.create(username="one")
+                two = User.objects.create(username="two")
+            assert flushed == []
+
+    assert flushed == [one.pk, two.pk]
+
+
+class LevelOneIdSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LevelOne
+        fields = ('id',)
+
+
+@pytest.fixture
+def level_one_id_webhook():
+    msw = register_webhook(LevelOneIdSerializer)()
+    yield msw
+    unregister_webhook(LevelOneIdSerializer)
+
+
+def test_unwatched_update_fields_are_dropped(db, django_capture_on_commit_callbacks, level_one_id_webhook):
+    one = LevelOne.objects.create(name="one", owner=User.objects.create(username="owner"))
+
+    with mock.patch.object(level_one_id_webhook, '_exec') as _exec:
+        with django_capture_on_commit_callbacks(execute=True), webhook_signal_session() as session:
+            one.save(update_fields=['name'])
+            assert not session._signals and not session._uncommitted
+
+            # The owner decides who receives the events
+            one.owner = User.objects.create(username="other")
+            one.save(update_fields=['owner'])
+
+    assert [s.update_fields for s in _exec.call_args.args[0][LevelOne]] == [frozenset({'owner'})]
+
+
+def test_track_field_changes(db, django_capture_on_commit_callbacks, monkeypatch, level_one_id_webhook):
+    monkeypatch.setattr(conf, 'TRACK_FIELD_CHANGES', True)
+    connect_signals()
+
+    try:
+        LevelOne.objects.create(name="one", owner=User.objects.create(username="owner"))
+        one = LevelOne.objects.get()
+
+        with mock.patch.object(level_one_id_webhook, '_exec') as _exec:
+            with django_capture_on_commit_callbacks(execute=True), webhook_signal_session() as session:
+                one.name = "one!"
+                one.save()
+                assert not session._signals and not session._uncommitted
+
+                one.owner = User.objects.create(username="other")
+                one.save()
+                one.save()
+
+        assert [s.update_fields for s in _exec.call_args.args[0][LevelOne]] == [frozenset({'owner_id'})]
+    finally:
+        models.signals.post_init.disconnect(_post_init, dispatch_uid="drf_webhooks.sessions._post_init")
+
+
+def test_track_in_place_changes(db, django_capture_on_commit_callbacks, monkeypatch):
+    class WebhookHeadersSerializer(serializers.ModelSerializer):
+        class Meta:
+            model = conf.WEBHOOK_MODEL
+            fields = ('id', 'target_headers')
+
+    monkeypatch.setattr(conf, 'TRACK_FIELD_CHANGES', True)
+    connect_signals()
+    msw = register_webhook(WebhookHeadersSerializer)()
+
+    try:
+        conf.WEBHOOK_MODEL.objects.create(owner=User.objects.create(), events=[], target_url="http://reon.mock/")
+        hook = conf.WEBHOOK_MODEL.objects.get()
+
+        with mock.patch.object(msw, '_exec') as _exec:
+            with django_capture_on_commit_callbacks(execute=True), webhook_signal_session():
+                hook.target_headers['X-Token'] = "secret"
+                hook.save()
+
+        assert [s.update_fields for s in _exec.call_args.args[0][conf.WEBHOOK_MODEL]] == [frozenset({'target_headers'})]
+    finally:
+        unregister_webhook(WebhookHeadersSerializer)
+        models.signals.post_init.disconnect(_post_init, dispatch_uid="drf_webhooks.sessions._post_init")
+
+
+def test_unrouted_signals_are_dropped(db, monkeypatch, level_one_id_webhook):
+    monkeypatch.setattr(conf, 'SESSION_MAX_SIGNALS', 1)
+
+    with mock.patch.object(WebhookSignalSession, 'flush') as flush:
+        with webhook_signal_session() as session:
+            with transaction.atomic():
+                User.objects.create(username="unrelated")
+                assert not session._signals and not session._uncommitted
+
+    flush.assert_called_once_with()
+
+
+def test_signal_buffer_dedupes_on_insert():
+    buffer = SignalBuffer()
+    one, two = User(pk=1), User(pk=2)
+
+    buffer.add(User, 1, 'created', one)
+    buffer.add(User, 1, 'updated', one, frozenset({'name'}))
+    buffer.add(User, 2, 'updated', two, frozenset({'name'}))
+    buffer.add(User, 2, 'updated', two, frozenset({'email'}))
+    buffer.add(User, 3, 'created')
+    buffer.add(User, 3, 'deleted', User(pk=3))
+
+    assert len(buffer) == 3
+    assert [(s.pk, s.cud, s.update_fields) for s in buffer] == [
+        (1, 'created', None),
+        (2, 'updated', frozenset({'name', 'email'})),
+        (3, 'created', None),
+        (3, 'deleted', None),
+    ]
+
+
+def test_nested_instances_are_not_kept(db, django_capture_on_commit_callbacks):
+    msw = register_webhook(LevelOneSerializer)()
+
+    try:
+        one = LevelOne.objects.create(name="one", owner=User.objects.create(username="owner"))
+        with mock.patch.object(msw, '_exec') as _exec:
+            with django_capture_on_commit_callbacks(execute=True), webhook_signal_session():
+                for _ in range(3):
+                    one.save()
+                    one.many.create(name="many")
+
+        signals = _exec.call_args.args[0]
+        assert [s.instance for s in signals[LevelOne]] == [one]
+        assert len(signals[Many]) == 3
+        assert all(s.instance is None for s in signals[Many])
+    finally:
+        unregister_webhook(LevelOneSerializer)
+
+
+@pytest.mark.parametrize('atomic', [False, True])
+def test_max_signals_flushes_early(transactional_db, monkeypatch, atomic):
+    monkeypatch.setattr(conf, 'SESSION_MAX_SIGNALS', 2)
+    msw = register_webhook(LevelOneSerializer)()
+
+    try:
+        owner = User.objects.create(username="owner")
+        conf.WEBHOOK_MODEL.objects.create(owner=owner, events=['level_one.created'], target_url="http://reon.mock/")
+        with mock.patch.object(msw, '_enqueue') as _enqueue, mock.patch.object(msw, '_exec') as _exec:
+            with webhook_signal_session(), transaction.atomic(durable=True) if atomic else nullcontext():
+                for i in range(5):
+                    LevelOne.objects.create(name=f"one{i}", owner=owner)
+
+                flushed = _enqueue.call_count if atomic else _exec.call_count
+                assert flushed == (0 if atomic else 2)
+
+        if atomic:
+            # Two early flushes resolved in the transaction, the rest after the commit
+            assert [len(call.args[0]) for call in _enqueue.call_args_list] == [2, 2]
+            assert sum(len(signals) for call in _exec.call_args_list for signals in call.args[0].values()) == 1
+        else:
+            assert _exec.call_count == 3
+    finally:
+        unregister_webhook(LevelOneSerializer)
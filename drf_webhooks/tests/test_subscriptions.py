@@ -0,0 +1,119 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ..config import conf
+from ..subscriptions import get_subscribed_webhook_ids, get_subscription_cache
+
+Webhook = conf.WEBHOOK_MODEL
+WebhookSubscription = conf.WEBHOOK_SUBSCRIPTION_MODEL
+
+
+@pytest.fixture(params=['local', 'default'])
+def subscription_cache(request, monkeypatch):
+    monkeypatch.setattr(conf, 'SUBSCRIPTION_CACHE', request.param)
+    cache = get_subscription_cache()
+    assert cache is not None
+    cache.clear()
+    cache.hits = cache.misses = 0
+    yield cache
+    cache.clear()
+
+
+def test_subscriptions_without_cache(db):
+    owner = get_user_model().objects.create()
+    webhook = Webhook.objects.create(owner=owner, events=['a.created', 'a.updated'], target_url="http://reon.mock/")
+
+    assert get_subscription_cache() is None
+    assert get_subscribed_webhook_ids([(owner.pk, 'a.created'), (owner.pk, 'a.deleted')]) == {
+        (owner.pk, 'a.created'): (str(webhook.pk),),
+    }
+
+
+def test_subscription_cache(db, subscription_cache):
+    owner = get_user_model().objects.create(username="owner")
+    other = get_user_model().objects.create(username="other")
+    webhook = Webhook.objects.create(owner=owner, events=['a.created'], target_url="http://reon.mock/")
+    keys = [(owner.pk, 'a.created'), (other.pk, 'a.created')]
+
+    with CaptureQueriesContext(connection) as ctx:
+        assert get_subscribed_webhook_ids(keys) == {(owner.pk, 'a.created'): (str(webhook.pk),)}
+        # Served from the cache, including the negative entry for `other`
+        assert get_subscribed_webhook_ids(keys) == {(owner.pk, 'a.created'): (str(webhook.pk),)}
+
+    assert len(ctx.captured_queries) == 1
+    assert (subscription_cache.hits, subscription_cache.misses) == (2, 2)
+
+    # Moving the webhook to another owner invalidates both owners
+    webhook.owner = other
+    webhook.save()
+    assert get_subscribed_webhook_ids(keys) == {(other.pk, 'a.created'): (str(webhook.pk),)}
+
+    webhook.delete()
+    assert get_subscribed_webhook_ids(keys) == {}
+
+
+def test_local_subscription_cache_eviction(monkeypatch):
+    monkeypatch.setattr(conf, 'SUBSCRIPTION_CACHE', 'local')
+    monkeypatch.setattr(conf, 'SUBSCRIPTION_CACHE_MAX_SIZE', 2)
+    cache = get_subscription_cache()
+    assert cache is not None
+
+    cache.set_many({(1, 'a'): (), (2, 'a'): ()}, cache.generation())
+    cache.get_many([(1, 'a')])
+    cache.set_many({(3, 'a'): ()}, cache.generation())
+
+    assert cache.get_many([(1, 'a'), (2, 'a'), (3, 'a')]).keys() == {(1, 'a'), (3, 'a')}
+
+    # Entries read before an invalidation are not written back
+    generation = cache.generation()
+    cache.invalidate(1, 'webhook')
+    cache.set_many({(1, 'a'): ('webhook',)}, generation)
+    assert cache.get_many([(1, 'a')]) == {}
+
+
+def test_subscription_cache_invalidated_on_commit(db, subscription_cache, django_capture_on_commit_callbacks):
+    owner = get_user_model().objects.create()
+    key = (owner.pk, 'a.created')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        webhook = Webhook.objects.create(owner=owner, events=['a.created'], target_url="http://reon.mock/")
+        # Another connection reads the committed rows before this transaction commits
+        subscription_cache.set_many({key: ()}, subscription_cache.generation())
+        assert subscription_cache.get_many([key]) == {key: ()}
+
+    assert get_subscribed_webhook_ids([key]) == {key: (str(webhook.pk),)}
+
+
+def test_subscription_table(db, monkeypatch):
+    monkeypatch.setattr(conf, 'SUBSCRIPTION_TABLE', True)
+    owner = get_user_model().objects.create(username="owner")
+    other = get_user_model().objects.create(username="other")
+    webhook = Webhook.objects.create(owner=owner, events=['a.created', 'a.updated'], target_url="http://reon.mock/")
+
+    def rows():
+        return sorted(WebhookSubscription.objects.values_list('owner_id', 'event'))
+
+    assert rows() == [(owner.pk, 'a.created'), (owner.pk, 'a.updated')]
+
+    with CaptureQueriesContext(connection) as ctx:
+        assert get_subscribed_webhook_ids([(owner.pk, 'a.created'), (owner.pk, 'a.deleted')]) == {
+            (owner.pk, 'a.created'): (str(webhook.pk),),
+        }
+    assert '"events"' not in ctx.captured_queries[0]['sql']
+
+    webhook.owner = other
+    webhook.events = ['a.deleted']
+    webhook.save()
+    assert rows() == [(other.pk, 'a.deleted')]
+
+    # Bulk updates send no signals
+    Webhook.objects.filter(pk=webhook.pk).update(events=['a.created'])
+    assert rows() == [(other.pk, 'a.deleted')]
+    call_command('sync_webhook_subscriptions', stdout=None)
+    assert rows() == [(other.pk, 'a.created')]
+
+    webhook.delete()
+    assert rows() == []
@@ -1,6 +1,12 @@
 from django.contrib.auth import get_user_model
+from rest_framework import serializers
 
-from drf_webhooks.utils import get_serializer_query_names
+from drf_webhooks.utils import (
+    chunked,
+    get_serializer_query_names,
+    get_serializer_related_paths,
+    get_serializer_watched_fields,
+)
 
 from .models import LevelOne, LevelOneSide, LevelThree, LevelTwo, Many
 from .serializers import LevelTwoSerializer
@@ -28,3 +34,42 @@ def test_get_serializer_model_fields(db):
     ]
 
     assert fields == expected
+
+
+def test_chunked():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunked([], 2)) == []
+
+
+def test_get_serializer_related_paths():
+    assert list(get_serializer_related_paths(LevelTwoSerializer())) == [
+        ('parent', False),
+        ('parent__side', False),
+        ('parent__many', True),
+        ('levelthree_set', True),
+    ]
+
+
+def test_get_serializer_watched_fields():
+    assert get_serializer_watched_fields(LevelTwoSerializer()) == {
+        LevelTwo: {'id', 'name', 'parent', 'parent_id'},
+        LevelOne: {'id', 'name'},
+        # Reached through reverse relations, so the foreign keys pointing back count
+        LevelOneSide: {'id', 'name', 'one', 'one_id'},
+        Many: {'id', 'name', 'level_ones'},
+        LevelThree: {'id', 'name', 'parent', 'parent_id'},
+    }
+
+
+def test_get_serializer_watched_fields_unknown_source():
+    class LevelThreeMethodSerializer(serializers.ModelSerializer):
+        label = serializers.SerializerMethodField()
+
+        class Meta:
+            model = LevelThree
+            fields = ('id', 'label')
+
+        def get_label(self, instance):
+            return instance.name
+
+    assert get_serializer_watched_fields(LevelThreeMethodSerializer()) == {LevelThree: None}
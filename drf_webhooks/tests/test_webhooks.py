@@ -1,16 +1,40 @@
 import json
+from contextlib import nullcontext
+from unittest import mock
 
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
 
+from .. import tasks
 from ..config import REGISTERED_WEBHOOK_CHOICES, conf
-from ..main import ModelSerializerWebhook, register_webhook, unregister_webhook
-from ..sessions import webhook_signal_session
-from .models import LevelOne, LevelOneSide, LevelThree, LevelTwo, Many
+from ..main import (
+    ModelSerializerWebhook,
+    Signal,
+    get_routes,
+    register_webhook,
+    unregister_webhook,
+)
+from ..sessions import WebhookSignalSession, webhook_signal_session
+from ..signals import nested_fan_out
+from ..tasks import _serialize_instance
+from .models import (
+    LevelOne,
+    LevelOneSide,
+    LevelThree,
+    LevelThreeProxy,
+    LevelTwo,
+    Many,
+)
 from .serializers import (
+    LevelOneSerializer,
     LevelOneSideSerializer,
     LevelThreeSerializer,
     LevelTwoSerializer,
+    ManySerializer,
 )
 
 Webhook = conf.WEBHOOK_MODEL
@@ -50,7 +74,517 @@ def test_serializer_webhook_define_success():
         unregister_webhook(LevelTwoSerializer)
 
 
-def test_serializer_webhook_events(db, httpx_mock):
+def test_serializer_webhook_routes():
+    msw = register_webhook(LevelTwoSerializer)()
+
+    try:
+        assert (msw, LevelTwo) in get_routes(LevelTwo)
+        assert (msw, LevelThree) in get_routes(LevelThree)
+        assert (msw, LevelThree) in get_routes(LevelThreeProxy)
+        assert all(route.webhook is not msw for route in get_routes(get_user_model()))
+    finally:
+        unregister_webhook(LevelTwoSerializer)
+
+    assert all(route.webhook is not msw for route in get_routes(LevelThreeProxy))
+
+
+def test_nested_changes_use_chunked_in_lookups(db, monkeypatch):
+    monkeypatch.setattr(conf, 'MAX_QUERY_PARAMS', 2)
+    msw = register_webhook(LevelTwoSerializer)()
+
+    try:
+        owner = get_user_model().objects.create()
+        two = LevelTwo.objects.create(name="two", parent=LevelOne.objects.create(name="one", owner=owner))
+        threes = [LevelThree.objects.create(name=f"three{i}", parent=two) for i in range(5)]
+
+        with CaptureQueriesContext(connection) as ctx:
+            affected_pks = msw._find_affected_pks({LevelThree: {t.pk for t in threes}}, [])
+
+        assert affected_pks == {two.pk}
+        assert len(ctx.captured_queries) == 3
+        assert all(' OR ' not in q['sql'] for q in ctx.captured_queries)
+        assert all(' IN ' in q['sql'] for q in ctx.captured_queries)
+    finally:
+        unregister_webhook(LevelTwoSerializer)
+
+
+def test_overridden_base_getters(db):
+    calls = []
+
+    class LevelTwoSerializerWebhook(ModelSerializerWebhook):
+        def get_signal_model_instance_base_getters(self):
+            getters = super().get_signal_model_instance_base_getters()
+
+            def level_three(instance):
+                calls.append(instance)
+                return Q(pk=instance.parent_id)
+
+            getters[LevelThree] = level_three
+            return getters
+
+    msw = register_webhook(LevelTwoSerializer)(LevelTwoSerializerWebhook)
+
+    try:
+        assert LevelThree not in msw.plan.query_names
+        assert LevelOne in msw.plan.query_names
+
+        owner = get_user_model().objects.create()
+        two = LevelTwo.objects.create(name="two", parent=LevelOne.objects.create(name="one", owner=owner))
+        three = LevelThree.objects.create(name="three", parent=two)
+
+        with mock.patch.object(msw, '_dispatch_many') as dispatch_many:
+            msw._exec({LevelThree: [Signal(three, three.pk, 'updated')]})
+
+        assert calls == [three]
+        assert dispatch_many.call_args.args[0] == [(two, 'updated')]
+    finally:
+        unregister_webhook(LevelTwoSerializer)
+
+
+@pytest.mark.parametrize('count', [1, 20])
+def test_subscriptions_resolved_in_one_query(db, django_capture_on_commit_callbacks, count):
+    register_webhook(LevelOneSerializer)()
+
+    try:
+        owners = [get_user_model().objects.create(username=f"owner{i}") for i in range(count)]
+        webhooks = {
+            owner.pk: Webhook.objects.create(owner=owner, events=['level_one.created'], target_url="http://reon.mock/")
+            for owner in owners
+        }
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            session = WebhookSignalSession()
+            for owner in owners:
+                LevelOne.objects.create(name="one", owner=owner)
+            session.close()
+
+        with mock.patch.object(tasks.dispatch_serializer_webhook_event, 'apply_async') as apply_async:
+            with CaptureQueriesContext(connection) as ctx:
+                for callback in callbacks:
+                    callback()
+
+        assert len(ctx.captured_queries) == 1
+        # (webhook_id, event, owner_id, ...)
+        delivered = sorted((call.kwargs['args'][2], call.kwargs['args'][0]) for call in apply_async.call_args_list)
+        assert delivered == sorted((owner_pk, str(webhook.pk)) for owner_pk, webhook in webhooks.items())
+        assert all(call.kwargs['args'][1] == 'level_one.created' for call in apply_async.call_args_list)
+    finally:
+        unregister_webhook(LevelOneSerializer)
+
+
+def test_serialize_once_per_instance(db, django_capture_on_commit_callbacks, httpx_mock, monkeypatch):
+    monkeypatch.setattr(conf, 'DISPATCH_MODE', 'instance')
+    register_webhook(LevelOneSerializer)()
+
+    try:
+        owner = get_user_model().objects.create()
+        for i in range(3):
+            httpx_mock.add_response(url=f"http://reon.mock/{i}/")
+            Webhook.objects.create(owner=owner, events=['level_one.created'], target_url=f"http://reon.mock/{i}/")
+
+        with mock.patch.object(
+            LevelOneSerializer,
+            'to_representation',
+            autospec=True,
+            side_effect=LevelOneSerializer.to_representation,
+        ) as to_representation:
+            with django_capture_on_commit_callbacks(execute=True), webhook_signal_session():
+                one = LevelOne.objects.create(name="one", owner=owner)
+
+        assert to_representation.call_count == 1
+
+        requests = httpx_mock.get_requests()
+        assert sorted(str(r.url) for r in requests) == [f"http://reon.mock/{i}/" for i in range(3)]
+        assert all(json.loads(r.content)["payload"]["id"] == one.pk for r in requests)
+    finally:
+        unregister_webhook(LevelOneSerializer)
+
+
+def test_serializer_queryset_plan(db, django_assert_num_queries):
+    msw = register_webhook(LevelTwoSerializer)()
+
+    try:
+        assert msw.plan.select_related == ('parent', 'parent__side')
+        assert msw.plan.prefetch_related == ('parent__many', 'levelthree_set')
+
+        owner = get_user_model().objects.create()
+        one = LevelOne.objects.create(name="one", owner=owner)
+        LevelOneSide.objects.create(name="side", one=one)
+        Many.objects.create(name="many").level_ones.add(one)
+        two = LevelTwo.objects.create(name="two", parent=one)
+        for i in range(3):
+            LevelThree.objects.create(name=f"three{i}", parent=two)
+
+        # One query for the joined rows, one per prefetched relation
+        with django_assert_num_queries(3):
+            data = _serialize_instance(msw.serializer_module_path, two.pk)
+
+        assert data is not None
+        assert len(data['levelthree_set']) == 3
+    finally:
+        unregister_webhook(LevelTwoSerializer)
+
+
+def test_bulk_dispatch(db, django_capture_on_commit_callbacks, monkeypatch, django_assert_num_queries):
+    monkeypatch.setattr(conf, 'DISPATCH_MODE', 'bulk')
+    monkeypatch.setattr(conf, 'BULK_DISPATCH_SIZE', 3)
+
+    @register_webhook(LevelTwoSerializer)
+    class LevelTwoSerializerWebhook(ModelSerializerWebhook):
+        def get_owner(self, instance):
+            return instance.parent.owner  # type: ignore
+
+    try:
+        owner = get_user_model().objects.create()
+        webhook = Webhook.objects.create(owner=owner, events=['level_two.updated'], target_url="http://reon.mock/")
+        one = LevelOne.objects.create(name="one", owner=owner)
+        twos = [LevelTwo.objects.create(name=f"two{i}", parent=one) for i in range(5)]
+
+        with mock.patch.object(tasks.dispatch_serializer_webhook_events_bulk, 'apply_async') as apply_async:
+            with django_capture_on_commit_callbacks(execute=True), webhook_signal_session():
+                one.name = "one!"
+                one.save()
+
+        # 5 instances in chunks of 3
+        assert apply_async.call_count == 2
+        items = [item for call in apply_async.call_args_list for item in call.kwargs['args'][1]]
+        assert sorted(items) == sorted((str(two.pk), owner.pk, [str(webhook.pk)]) for two in twos)
+
+        with mock.patch.object(tasks.dispatch_webhook_event, 'apply_async') as apply_async:
+            # One query for the joined rows, one per prefetched relation and chunk of 3
+            with django_assert_num_queries(1 + 2 * 2):
+                tasks.dispatch_serializer_webhook_events_bulk(
+                    'level_two.updated',
+                    items,
+                    'drf_webhooks.tests.serializers.LevelTwoSerializer',
+                )
+
+        assert apply_async.call_count == 5
+        assert all(call.kwargs['args'][4]['parent']['name'] == "one!" for call in apply_async.call_args_list)
+    finally:
+        unregister_webhook(LevelTwoSerializer)
+
+
+def test_session_dispatch(db, django_capture_on_commit_callbacks, httpx_mock, monkeypatch):
+    monkeypatch.setattr(conf, 'DISPATCH_MODE', 'session')
+    monkeypatch.setattr(conf, 'SESSION_BATCH_SIZE', 2)
+    register_webhook(LevelOneSerializer)()
+
+    try:
+        owner = get_user_model().objects.create()
+        for i in range(2):
+            httpx_mock.add_response(url=f"http://reon.mock/{i}/")
+            Webhook.objects.create(owner=owner, events=['level_one.created'], target_url=f"http://reon.mock/{i}/")
+
+        with mock.patch.object(tasks.dispatch_session_batch, 'apply_async') as apply_async:
+            with django_capture_on_commit_callbacks(execute=True), webhook_signal_session():
+                ones = [LevelOne.objects.create(name=f"one{i}", owner=owner) for i in range(3)]
+
+        # 3 events for 2 webhooks in chunks of 2
+        assert apply_async.call_count == 2
+        items = [item for call in apply_async.call_args_list for item in call.kwargs['args'][0]]
+        assert sorted(item[2] for item in items) == sorted(str(one.pk) for one in ones)
+
+        with mock.patch.object(
+            LevelOneSerializer,
+            'to_representation',
+            autospec=True,
+            side_effect=LevelOneSerializer.to_representation,
+        ) as to_representation:
+            tasks.dispatch_session_batch(items)
+
+        assert to_representation.call_count == 3
+
+        requests = httpx_mock.get_requests()
+        assert len(requests) == 6
+        assert sorted(json.loads(r.content)["payload"]["id"] for r in requests) == sorted(
+            one.pk for one in ones for _ in range(2)
+        )
+    finally:
+        unregister_webhook(LevelOneSerializer)
+
+
+def test_debounce(db, django_capture_on_commit_callbacks):
+    @register_webhook(LevelOneSerializer)
+    class LevelOneSerializerWebhook(ModelSerializerWebhook):
+        debounce = "5s"
+
+    try:
+        caches[conf.DEBOUNCE_CACHE].clear()
+        owner = get_user_model().objects.create()
+        webhook = Webhook.objects.create(
+            owner=owner,
+            events=['level_one.created', 'level_one.updated'],
+            target_url="http://reon.mock/",
+        )
+
+        with mock.patch.object(tasks.dispatch_serializer_webhook_event, 'apply_async') as apply_async:
+            with django_capture_on_commit_callbacks(execute=True), webhook_signal_session():
+                one = LevelOne.objects.create(name="one", owner=owner)
+
+            # Separate sessions, e.g. separate tasks
+            for i in range(3):
+                with django_capture_on_commit_callbacks(execute=True), webhook_signal_session():
+                    one.name = f"one{i}"
+                    one.save()
+
+        assert [(call.kwargs['args'][1], call.kwargs['countdown']) for call in apply_async.call_args_list] == [
+            ('level_one.created', None),
+            ('level_one.updated', 5),
+        ]
+        assert apply_async.call_args.kwargs['args'][:4] == (str(webhook.pk), 'level_one.updated', owner.pk, str(one.pk))
+    finally:
+        unregister_webhook(LevelOneSerializer)
+
+
+def test_bulk_session_api(db, django_capture_on_commit_callbacks):
+    register_webhook(LevelOneSerializer)()
+
+    @register_webhook(LevelTwoSerializer)
+    class LevelTwoSerializerWebhook(ModelSerializerWebhook):
+        def get_owner(self, instance):
+            return instance.parent.owner  # type: ignore
+
+    try:
+        owner = get_user_model().objects.create()
+        Webhook.objects.create(
+            owner=owner,
+            events=['level_one.created', 'level_one.deleted', 'level_two.updated'],
+            target_url="http://reon.mock/",
+        )
+
+        def delivered(apply_async):
+            return sorted((call.kwargs['args'][1], call.kwargs['args'][3]) for call in apply_async.call_args_list)
+
+        with mock.patch.object(tasks.dispatch_serializer_webhook_event, 'apply_async') as apply_async:
+            with django_capture_on_commit_callbacks(execute=True), webhook_signal_session() as session:
+                ones = LevelOne.objects.bulk_create([LevelOne(name=f"one{i}", owner=owner) for i in range(2)])
+                session.created_many(ones)
+
+        assert delivered(apply_async) == sorted(('level_one.created', str(one.pk)) for one in ones)
+
+        two = LevelTwo.objects.create(name="two", parent=ones[0])
+
+        with mock.patch.object(tasks.dispatch_serializer_webhook_event, 'apply_async') as apply_async:
+            with django_capture_on_commit_callbacks(execute=True), webhook_signal_session() as session:
+                queryset = LevelOne.objects.filter(pk__in=[one.pk for one in ones])
+                queryset.update(name="renamed")
+                session.updated_queryset(queryset, update_fields=['name'])
+
+                # Not serialized by any webhook
+                session.updated_queryset(queryset, update_fields=['dt_unknown'])
+
+                session.deleted_pks(LevelOne, [ones[1].pk])
+                LevelOne.objects.filter(pk=ones[1].pk).delete()
+
+        assert delivered(apply_async) == [('level_one.deleted', str(ones[1].pk)), ('level_two.updated', str(two.pk))]
+    finally:
+        unregister_webhook(LevelOneSerializer)
+        unregister_webhook(LevelTwoSerializer)
+
+
+def test_deleted_nested_instances_update_their_parents(db, django_capture_on_commit_callbacks):
+    @register_webhook(LevelTwoSerializer)
+    class LevelTwoSerializerWebhook(ModelSerializerWebhook):
+        def get_owner(self, instance):
+            return instance.parent.owner  # type: ignore
+
+    try:
+        owner = get_user_model().objects.create()
+        Webhook.objects.create(owner=owner, events=['level_two.updated'], target_url="http://reon.mock/")
+        one = LevelOne.objects.create(name="one", owner=owner)
+        twos = [LevelTwo.objects.create(name=f"two{i}", parent=one) for i in range(2)]
+        for i in range(3):
+            LevelThree.objects.create(name=f"three{i}", parent=twos[0])
+
+        with mock.patch.object(tasks.dispatch_serializer_webhook_event, 'apply_async') as apply_async:
+            with django_capture_on_commit_callbacks(execute=True), webhook_signal_session():
+                LevelThree.objects.filter(parent=twos[0]).delete()
+
+        assert [call.kwargs['args'][1:4:2] for call in apply_async.call_args_list] == [
+            ('level_two.updated', str(twos[0].pk))
+        ]
+    finally:
+        unregister_webhook(LevelTwoSerializer)
+
+
+def test_unwatched_deletes_are_not_collected_again(db):
+    # Serializes `Many`, which deleting `LevelOne` never deletes
+    @register_webhook(ManySerializer)
+    class ManySerializerWebhook(ModelSerializerWebhook):
+        def get_owner(self, instance):
+            return None
+
+    try:
+        owner = get_user_model().objects.create()
+
+        def delete_queries(session):
+            for i in range(3):
+                LevelTwo.objects.create(name=f"two{i}", parent=LevelOne.objects.create(name=f"one{i}", owner=owner))
+            with CaptureQueriesContext(connection) as ctx, session:
+                LevelOne.objects.filter(owner=owner).delete()
+            return len(ctx.captured_queries)
+
+        assert delete_queries(webhook_signal_session()) == delete_queries(nullcontext())
+    finally:
+        unregister_webhook(ManySerializer)
+
+
+@pytest.mark.parametrize('count', [1, 10])
+def test_cascade_owners_are_not_loaded(db, django_capture_on_commit_callbacks, count):
+    register_webhook(LevelOneSerializer)()
+
+    try:
+        owner = get_user_model().objects.create()
+        Webhook.objects.create(owner=owner, events=['level_one.deleted'], target_url="http://reon.mock/")
+        ones = [LevelOne.objects.create(name=f"one{i}", owner=owner) for i in range(count)]
+
+        with mock.patch.object(tasks.dispatch_serializer_webhook_event, 'apply_async') as apply_async:
+            with CaptureQueriesContext(connection) as ctx:
+                with django_capture_on_commit_callbacks(execute=True), webhook_signal_session():
+                    LevelOne.objects.filter(owner=owner).delete()
+
+        owner_table = get_user_model()._meta.db_table
+        assert not [q for q in ctx.captured_queries if f'FROM "{owner_table}"' in q['sql']]
+        assert sorted(call.kwargs['args'][3] for call in apply_async.call_args_list) == sorted(
+            str(one.pk) for one in ones
+        )
+    finally:
+        unregister_webhook(LevelOneSerializer)
+
+
+@pytest.mark.parametrize('count', [1, 10])
+def test_owner_lookup_resolved_in_one_query(db, django_capture_on_commit_callbacks, count):
+    @register_webhook(LevelTwoSerializer)
+    class LevelTwoSerializerWebhook(ModelSerializerWebhook):
+        owner_field = 'parent__owner'
+
+    try:
+        owner = get_user_model().objects.create()
+        Webhook.objects.create(owner=owner, events=['level_two.created'], target_url="http://reon.mock/")
+        one = LevelOne.objects.create(name="one", owner=owner)
+
+        with mock.patch.object(tasks.dispatch_serializer_webhook_event, 'apply_async') as apply_async:
+            with CaptureQueriesContext(connection) as ctx:
+                with django_capture_on_commit_callbacks(execute=True), webhook_signal_session():
+                    twos = [LevelTwo.objects.create(name=f"two{i}", parent=one) for i in range(count)]
+
+        assert (
+            len(
+                [
+                    q
+                    for q in ctx.captured_queries
+                    if q['sql'].startswith('SELECT "tests_leveltwo"."id", "tests_levelone"."owner_id"')
+                ]
+            )
+            == 1
+        )
+        assert {call.kwargs['args'][2] for call in apply_async.call_args_list} == {owner.pk}
+        assert sorted(call.kwargs['args'][3] for call in apply_async.call_args_list) == sorted(
+            str(two.pk) for two in twos
+        )
+        assert LevelTwoSerializerWebhook.get_owners(twos) == {two.pk: owner.pk for two in twos}
+    finally:
+        unregister_webhook(LevelTwoSerializer)
+
+
+def test_owner_property(db, django_capture_on_commit_callbacks, monkeypatch):
+    monkeypatch.setattr(LevelTwo, 'owner', property(lambda self: self.parent.owner), raising=False)
+    register_webhook(LevelTwoSerializer)()
+
+    try:
+        owner = get_user_model().objects.create()
+        Webhook.objects.create(owner=owner, events=['level_two.created'], target_url="http://reon.mock/")
+        one = LevelOne.objects.create(name="one", owner=owner)
+
+        with mock.patch.object(tasks.dispatch_serializer_webhook_event, 'apply_async') as apply_async:
+            with django_capture_on_commit_callbacks(execute=True), webhook_signal_session():
+                two = LevelTwo.objects.create(name="two", parent=one)
+
+        assert [call.kwargs['args'][2:4] for call in apply_async.call_args_list] == [(owner.pk, str(two.pk))]
+    finally:
+        unregister_webhook(LevelTwoSerializer)
+
+
+@pytest.mark.parametrize('max_fan_out', [None, 2])
+def test_nested_fan_out(db, django_capture_on_commit_callbacks, max_fan_out):
+    @register_webhook(LevelTwoSerializer)
+    class LevelTwoSerializerWebhook(ModelSerializerWebhook):
+        def get_owner(self, instance):
+            return instance.parent.owner  # type: ignore
+
+    LevelTwoSerializerWebhook.max_fan_out = max_fan_out
+    fan_outs = []
+
+    def receiver(sender, webhook, size, background, **kwargs):
+        fan_outs.append((size, background))
+
+    nested_fan_out.connect(receiver)
+
+    try:
+        owner = get_user_model().objects.create()
+        Webhook.objects.create(owner=owner, events=['level_two.updated'], target_url="http://reon.mock/")
+        one = LevelOne.objects.create(name="one", owner=owner)
+        twos = [LevelTwo.objects.create(name=f"two{i}", parent=one) for i in range(5)]
+
+        with mock.patch.object(
+            tasks.dispatch_nested_changes, 'apply_async', wraps=tasks.dispatch_nested_changes.apply_async
+        ) as nested:
+            with mock.patch.object(tasks.dispatch_serializer_webhook_event, 'apply_async') as apply_async:
+                with django_capture_on_commit_callbacks(execute=True), webhook_signal_session():
+                    one.name = "one!"
+                    one.save()
+                    # Changed in the session itself, not dispatched again by the background task
+                    twos[0].save()
+
+        assert sorted(call.kwargs['args'][3] for call in apply_async.call_args_list) == sorted(
+            str(two.pk) for two in twos
+        )
+        if max_fan_out:
+            assert nested.call_count == 1
+            assert fan_outs == [(4, True)]
+        else:
+            assert not nested.called
+            assert fan_outs == [(5, False)]
+    finally:
+        nested_fan_out.disconnect(receiver)
+        unregister_webhook(LevelTwoSerializer)
+
+
+def test_nested_fan_out_waits_for_commit(db, django_capture_on_commit_callbacks, monkeypatch):
+    monkeypatch.setattr(conf, 'OUTBOX', True)
+
+    @register_webhook(LevelTwoSerializer)
+    class LevelTwoSerializerWebhook(ModelSerializerWebhook):
+        owner_field = 'parent__owner'
+        max_fan_out = 1
+
+    try:
+        one = LevelOne.objects.create(name="one", owner=get_user_model().objects.create())
+        for i in range(2):
+            LevelTwo.objects.create(name=f"two{i}", parent=one)
+
+        with mock.patch.object(tasks.dispatch_nested_changes, 'apply_async') as nested:
+            with django_capture_on_commit_callbacks(execute=True):
+                # Outbox sessions closed in a transaction resolve their changes in it
+                with pytest.raises(RuntimeError):
+                    with transaction.atomic():
+                        with webhook_signal_session():
+                            one.save()
+                        assert not nested.called
+                        raise RuntimeError
+
+                with transaction.atomic():
+                    with webhook_signal_session():
+                        one.save()
+                    assert not nested.called
+
+        assert nested.call_count == 1
+    finally:
+        unregister_webhook(LevelTwoSerializer)
+
+
+def test_serializer_webhook_events(db, django_capture_on_commit_callbacks, httpx_mock):
     @register_webhook(LevelTwoSerializer)
     class LevelTwoSerializerWebhook(ModelSerializerWebhook):
         base_name = 'test.level_two'
@@ -59,7 +593,7 @@ def test_serializer_webhook_events(db, httpx_mock):
             return instance.parent.owner  # type: ignore
 
     try:
-        with webhook_signal_session():
+        with django_capture_on_commit_callbacks(execute=True), webhook_signal_session():
             owner = get_user_model().objects.create()
 
             httpx_mock.add_response()
@@ -88,19 +622,19 @@ def test_serializer_webhook_events(db, httpx_mock):
 
             two2 = LevelTwo.objects.create(name="more two", parent=one)
 
-        with webhook_signal_session():
+        with django_capture_on_commit_callbacks(execute=True), webhook_signal_session():
             two.name = "updated name"
             two.save()
 
             three2 = LevelThree.objects.create(name="three2", parent=two2)
             three2_id = three2.pk
 
-        with webhook_signal_session():
+        with django_capture_on_commit_callbacks(execute=True), webhook_signal_session():
             many = Many.objects.create(name="Many")
             many.level_ones.add(one)
             many_id = many.pk
 
-        with webhook_signal_session():
+        with django_capture_on_commit_callbacks(execute=True), webhook_signal_session():
             one.delete()
 
         # for req in httpx_mock.get_requests():
@@ -119,6 +653,11 @@ def test_serializer_webhook_events(db, httpx_mock):
             level_two2__deleted,
         ) = [json.loads(r.content) for r in httpx_mock.get_requests()]
 
+        # The cascade is resolved as a set, deletes are sent in any order
+        level_two__deleted, level_two2__deleted = sorted(
+            (level_two__deleted, level_two2__deleted), key=lambda r: r["objectId"] != str(two.pk)
+        )
+
         assert level_two__created["event"] == "test.level_two.created"
         assert level_two__created["objectId"] == str(two.pk)
         assert level_two__created["payload"]["name"] == "two!"
@@ -1,10 +1,19 @@
 import importlib
-from typing import Generator, Type
+from itertools import islice
+from typing import Generator, Iterable, Type, TypeVar
 
 from django.db import models
 from django.db.models.fields.reverse_related import ForeignObjectRel
 from rest_framework import serializers
 
+T = TypeVar('T')
+
+
+def chunked(iterable: Iterable[T], size: int) -> Generator[list[T], None, None]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
 
 def load_object_from_string(string: str) -> object:
     module_path, class_name = string.rsplit(".", 1)
@@ -48,3 +57,98 @@ def get_serializer_query_names(
         yield (field_model, '__'.join(new_path))
 
         yield from get_serializer_query_names(next_serializer, new_path)
+
+
+def get_serializer_related_paths(
+    serializer: serializers.ModelSerializer,
+    path: list[str] | None = None,
+    many: bool = False,
+) -> Generator[tuple[str, bool], None, None]:
+    """
+    Yields `(lookup, many)` for every nested model serializer, where `lookup` can be passed to
+    `select_related` (`many=False`) or `prefetch_related` (`many=True`).
+    Forward and reverse one-to-one / foreign keys are joined, unless they are below a many relation.
+    """
+    model: models.Model = getattr(serializer.Meta, 'model')
+    model_field_map = {
+        (f.get_accessor_name() if hasattr(f, "get_accessor_name") else f.name): f  # type: ignore
+        for f in model._meta.get_fields()
+    }
+
+    for field_name, field in serializer.fields.items():
+        source: str = field.source or field_name  # type: ignore
+
+        if '.' in source or source == '*':
+            continue
+
+        if not isinstance(field, (serializers.ListSerializer, serializers.ModelSerializer)):
+            continue
+
+        if isinstance(field, serializers.ListSerializer):
+            next_serializer: serializers.ModelSerializer = field.child  # type: ignore
+        else:
+            next_serializer = field
+
+        try:
+            model_field = model_field_map[source]
+        except KeyError:
+            # Not a relation (e.g. a property), nothing to prefetch
+            continue
+
+        next_many = many or bool(model_field.many_to_many or model_field.one_to_many)
+        new_path = [*(path or []), source]
+
+        yield ('__'.join(new_path), next_many)
+
+        yield from get_serializer_related_paths(next_serializer, new_path, next_many)
+
+
+def get_serializer_watched_fields(
+    serializer: serializers.ModelSerializer,
+    watched: dict[Type[models.Model], set[str] | None] | None = None,
+) -> dict[Type[models.Model], set[str] | None]:
+    """
+    Returns the names (and attnames) of the model fields read by a serializer tree, per model.
+
+    `None` means any change matters, because a serializer reads something that does not map to a field
+    (e.g. `source='*'`, a `SerializerMethodField` or a property).
+    Nested models reached through a reverse relation also watch the foreign key pointing back.
+    """
+    if watched is None:
+        watched = {}
+
+    model: Type[models.Model] = getattr(serializer.Meta, 'model')
+    model_field_map = {
+        (f.get_accessor_name() if hasattr(f, "get_accessor_name") else f.name): f  # type: ignore
+        for f in model._meta.get_fields()
+    }
+    model_field_map['pk'] = model._meta.pk
+
+    fields = watched.setdefault(model, set())
+
+    for field_name, field in serializer.fields.items():
+        source: str = field.source or field_name  # type: ignore
+        model_field = model_field_map.get(source.split('.', 1)[0])
+
+        if source == '*' or model_field is None:
+            fields = watched[model] = None
+        elif fields is not None and model_field.concrete:
+            fields.update({model_field.name, model_field.attname})
+
+        if model_field is None or not isinstance(field, (serializers.ListSerializer, serializers.ModelSerializer)):
+            continue
+
+        if isinstance(field, serializers.ListSerializer):
+            next_serializer: serializers.ModelSerializer = field.child  # type: ignore
+        else:
+            next_serializer = field
+
+        if '.' not in source and isinstance(model_field, ForeignObjectRel):
+            # Moving a nested instance to another parent changes both parents
+            next_fields = watched.setdefault(next_serializer.Meta.model, set())
+            if next_fields is not None and model_field.field.concrete:
+                next_fields.update({model_field.field.name, model_field.field.attname})
+
+        get_serializer_watched_fields(next_serializer, watched)
+
+    return watched
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhook',
+            name='connect_timeout',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhook',
+            name='read_timeout',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0002_webhook_timeouts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhooklogentry',
+            name='claimed_dt',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhooklogentry',
+            name='pending',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AddField(
+            model_name='webhooklogentry',
+            name='req_host',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
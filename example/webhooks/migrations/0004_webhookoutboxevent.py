@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0003_webhooklogentry_delivery_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookOutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('dt_created', models.DateTimeField(auto_now_add=True)),
+                ('event', models.CharField(max_length=64)),
+                ('owner_pk', models.JSONField()),
+                ('object_id', models.CharField(max_length=255)),
+                ('webhook_ids', models.JSONField()),
+            ],
+            options={
+                'verbose_name': 'webhook outbox event',
+                'verbose_name_plural': 'webhook outbox',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('webhooks', '0005_webhook_batches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookSubscription',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('event', models.CharField(max_length=128)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                (
+                    'webhook',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name='subscriptions', to='webhooks.webhook'
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'webhook subscription',
+                'verbose_name_plural': 'webhook subscriptions',
+                'indexes': [models.Index(fields=['owner', 'event'], name='webhooks_we_owner_i_ccfb87_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='webhooksubscription',
+            constraint=models.UniqueConstraint(fields=('webhook', 'event'), name='unique_webhook_subscription'),
+        ),
+    ]
@@ -2,7 +2,12 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
-from drf_webhooks.models import AbstractWebhook, AbstractWebhookLogEntry
+from drf_webhooks.models import (
+    AbstractWebhook,
+    AbstractWebhookLogEntry,
+    AbstractWebhookOutboxEvent,
+    AbstractWebhookSubscription,
+)
 
 
 class Webhook(AbstractWebhook):
@@ -26,3 +31,19 @@ class WebhookLogEntry(AbstractWebhookLogEntry):
     class Meta:
         verbose_name = _("webhook log entry")
         verbose_name_plural = _("webhook log")
+
+
+class WebhookOutboxEvent(AbstractWebhookOutboxEvent):
+    class Meta:
+        verbose_name = _("webhook outbox event")
+        verbose_name_plural = _("webhook outbox")
+
+
+class WebhookSubscription(AbstractWebhookSubscription):
+    owner = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
+
+    class Meta:
+        verbose_name = _("webhook subscription")
+        verbose_name_plural = _("webhook subscriptions")
+        indexes = [models.Index(fields=['owner', 'event'])]
+        constraints = [models.UniqueConstraint(fields=['webhook', 'event'], name='unique_webhook_subscription')]